@@ -1,31 +1,64 @@
+import asyncio
 from typing import List
 
 from django.core import serializers
+from django.db import transaction
+from django.http import Http404
 from django.shortcuts import get_object_or_404
-from ninja import Router
-
-from hackernews.apps.news.models import HackerNewsComment, HackerNewsItem
-
-from .schema import (CustomResponse, DevNewsSchema, HackerNewsCommentSchema,
+from django.utils import timezone
+from ninja import Query, Router
+
+from hackernews.apps.news.archive import load_archived_story
+from hackernews.apps.news.authors import author_activity
+from hackernews.apps.news.changes import (changes_since, record_changes,
+                                          story_change)
+from hackernews.apps.news.models import (HackerNewsAuthor, HackerNewsComment,
+                                         HackerNewsItem, ItemChange)
+from hackernews.apps.news.signals import items_changed
+from hackernews.apps.news.store import front_page
+from hackernews.db import use_primary
+
+from .renderers import json_response
+from .schema import (AuthorSchema, ChangeFeedSchema, CustomResponse,
+                     DevNewsSchema, HackerNewsCommentSchema,
                      HackerNewsItemSchema)
 
 router = Router()
 
 
+# Fields of HackerNewsItemSchema, read with values() by the list endpoint
+ITEM_FIELDS = ('by', 'descendants', 'item_id', 'score', 'title', 'url', 'item_type')
+
+# Upper bound on how long a change feed request is held open, in seconds
+MAX_CHANGES_TIMEOUT = 30
+CHANGES_POLL_INTERVAL = 1
+
+SORT_ORDERS = {
+    'new': ('-id',),
+    'hot': ('-rank_score', '-id'),
+}
+
+
 @router.get("/items", response=List[HackerNewsItemSchema])
-def list_items(request, limit: int = 100):
+def list_items(request, limit: int = Query(100, ge=1), sort: str = 'new'):
     """
     Retrieve a list of Hacker News items.
 
     Args:
         request (HttpRequest): The HTTP request object.
         limit (int, optional): The maximum number of items to retrieve. Defaults to 100.
+        sort (str, optional): 'new' for the latest items or 'hot' for the ranked ones. Defaults to 'new'.
 
     Returns:
         List[HackerNewsItemSchema]: The list of Hacker News items.
     """
-    items_qs = HackerNewsItem.objects.order_by('-id')[:limit]
-    return items_qs
+    stored_items = front_page.hottest(limit) if sort == 'hot' else front_page.newest(limit)
+    if stored_items is not None:
+        return json_response(request, [item.as_dict() for item in stored_items])
+
+    ordering = SORT_ORDERS.get(sort, SORT_ORDERS['new'])
+    items = HackerNewsItem.objects.order_by(*ordering).values(*ITEM_FIELDS)[:limit]
+    return json_response(request, list(items))
 
 @router.post("/items")
 def add_item(request, payload: DevNewsSchema):
@@ -43,17 +76,21 @@ def add_item(request, payload: DevNewsSchema):
     score = 0
     item_type=f'in-house'
 
-    item = HackerNewsItem.objects.create(
-        title=payload.title,
-        by=payload.by,
-        url=payload.url,
-        descendants=descendants,
-        score=score,
-        item_type=item_type,
-        in_house=True
-    )
-    item.item_id = item.id 
-    item.save()
+    with transaction.atomic():
+        item = HackerNewsItem.objects.create(
+            title=payload.title,
+            by=payload.by,
+            url=payload.url,
+            descendants=descendants,
+            score=score,
+            item_type=item_type,
+            in_house=True,
+            posted_at=timezone.now()
+        )
+        item.item_id = item.id 
+        item.save()
+        record_changes([story_change(item, ItemChange.CREATED)])
+    items_changed.send(sender=HackerNewsItem)
     
 
     return {'by': item.by,
@@ -63,6 +100,7 @@ def add_item(request, payload: DevNewsSchema):
 
 
 @router.put("/items/{item_id}", response={200:CustomResponse, 401: CustomResponse})
+@use_primary()
 def update_item(request, item_id: int, payload: DevNewsSchema):
     """
     Update an existing Hacker News item.
@@ -81,11 +119,16 @@ def update_item(request, item_id: int, payload: DevNewsSchema):
     else:
         for attr, value in payload.dict().items():
             setattr(item, attr, value)
-        item.save()
+        item.version += 1
+        with transaction.atomic():
+            item.save()
+            record_changes([story_change(item, ItemChange.UPDATED)])
+        items_changed.send(sender=HackerNewsItem)
     
         return 200, CustomResponse(message='Update Succesul!', body=payload)
     
 @router.delete("/items/{item_id}", response={200:CustomResponse, 401: CustomResponse})
+@use_primary()
 def delete_item(request, item_id: int):
     """
     Delete an existing Hacker News item.
@@ -102,7 +145,11 @@ def delete_item(request, item_id: int):
         return 401, CustomResponse(message='Unauthorized', body=None)
     else:
         # Perform item deletion logic
-        item.delete()
+        item.version += 1
+        with transaction.atomic():
+            record_changes([story_change(item, ItemChange.DELETED)])
+            item.delete()
+        items_changed.send(sender=HackerNewsItem)
 
         return 200, CustomResponse(message='Delete Successful!')
     
@@ -110,7 +157,13 @@ def delete_item(request, item_id: int):
 
 @router.get("/items/{item_id}", response=HackerNewsItemSchema)
 def get_item(request, item_id: int):
-    item = HackerNewsItem.objects.get(item_id=item_id)
+    try:
+        item = HackerNewsItem.objects.get(item_id=item_id)
+    except HackerNewsItem.DoesNotExist:
+        archived = load_archived_story(item_id=item_id)
+        if archived is None:
+            raise Http404('No HackerNewsItem matches the given query.')
+        item, _ = archived
     return item
 
 
@@ -127,24 +180,93 @@ def get_item_comments(request, item_id: int):
     Returns:
         HackerNewsItemSchema: The details of the retrieved Hacker News item.
     """
-    comments = HackerNewsComment.objects.filter(news_item__item_id=item_id)
-    cleaned_comments = []
-
-    for comment in comments:
-        if comment.parent:
-            parent_id = comment.parent.id if isinstance(comment.parent.id, int) else None
-        else:
-            parent_id = None
-
-        cleaned_comment = HackerNewsCommentSchema(
-            id=comment.id,
-            by=comment.by,
-            item_id=comment.item_id,
-            text=comment.text,
-            parent=parent_id,
-            children=[]
-        )
+    if not HackerNewsItem.objects.filter(item_id=item_id).exists():
+        archived = load_archived_story(item_id=item_id)
+        comments = archived[1] if archived else []
+        return [
+            HackerNewsCommentSchema(
+                id=comment.id,
+                by=comment.by,
+                item_id=comment.item_id,
+                text=comment.text,
+                parent=comment.parent_id,
+                children=[]
+            )
+            for comment in comments
+        ]
+
+    comments = (
+        HackerNewsComment.objects.filter(news_item_id=item_id)
+        .values('id', 'by', 'item_id', 'text', 'parent_id')
+    )
+    cleaned_comments = [
+        {
+            'id': comment['id'],
+            'by': comment['by'],
+            'item_id': comment['item_id'],
+            'text': comment['text'],
+            'parent': comment['parent_id'],
+            'children': [],
+        }
+        for comment in comments
+    ]
+
+    return json_response(request, cleaned_comments)
+
+
+@router.get("/users/{name}", response=AuthorSchema)
+def get_user(request, name: str, cursor: str = None, limit: int = Query(20, ge=1)):
+    """
+    Retrieve a Hacker News user with a page of their stories and comments.
+
+    Args:
+        request (HttpRequest): The HTTP request object.
+        name (str): The username.
+        cursor (str, optional): The next_cursor of the previous page.
+        limit (int, optional): The number of activity entries per page. Defaults to 20.
 
-        cleaned_comments.append(cleaned_comment)
+    Returns:
+        AuthorSchema: The user's counts and activity, newest first.
+    """
+    author = get_object_or_404(HackerNewsAuthor, name=name)
+    activity, next_cursor = author_activity(name, cursor=cursor, limit=min(limit, 100))
+
+    return {
+        'name': author.name,
+        'story_count': author.story_count,
+        'comment_count': author.comment_count,
+        'first_seen_at': author.first_seen_at,
+        'last_active_at': author.last_active_at,
+        'activity': activity,
+        'next_cursor': next_cursor,
+    }
+
+
+@router.get("/changes", response=ChangeFeedSchema)
+async def list_changes(request, since: int = 0, limit: int = Query(100, ge=1), timeout: int = 0):
+    """
+    Retrieve the items created, updated or deleted after a cursor.
 
-    return cleaned_comments
+    With a timeout the request is held open until a change arrives or the
+    timeout expires, so consumers can long-poll instead of re-reading /items.
+
+    Args:
+        request (HttpRequest): The HTTP request object.
+        since (int, optional): The cursor returned by the previous call. Defaults to 0.
+        limit (int, optional): The maximum number of changes to retrieve, up to 100. Defaults to 100.
+        timeout (int, optional): Seconds to wait for changes, up to 30. Defaults to 0.
+
+    Returns:
+        ChangeFeedSchema: The changes, oldest first, and the cursor to pass next time.
+    """
+    limit = min(limit, 100)
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + min(max(timeout, 0), MAX_CHANGES_TIMEOUT)
+    while True:
+        changes = [change async for change in changes_since(since, limit)]
+        if changes or loop.time() >= deadline:
+            break
+        await asyncio.sleep(CHANGES_POLL_INTERVAL)
+
+    cursor = changes[-1]['id'] if changes else since
+    return json_response(request, {'changes': changes, 'cursor': cursor})
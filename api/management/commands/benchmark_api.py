@@ -0,0 +1,84 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from ninja.responses import NinjaJSONEncoder
+
+from api.api import ITEM_FIELDS
+from api.renderers import renderer
+from api.schema import HackerNewsCommentSchema, HackerNewsItemSchema
+from hackernews.apps.news.models import HackerNewsComment, HackerNewsItem
+
+
+class Command(BaseCommand):
+    """
+    Custom management command for benchmarking the API serialization paths.
+
+    Inherits from Django's BaseCommand class.
+    """
+    help = 'Compare rows/sec of the schema-based and the values()-based paths of list_items and comments'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=500, help='Number of items listed per run')
+        parser.add_argument('--iterations', type=int, default=20)
+
+    def handle(self, *args, **options):
+        """
+        Handle the execution of the command.
+
+        Runs each path against the stored data and prints its throughput.
+
+        """
+        story = HackerNewsItem.objects.order_by('-stored_comment_count').first()
+        if story is None:
+            raise CommandError('No stored items to benchmark, run a crawl first')
+
+        limit = options['limit']
+        iterations = options['iterations']
+
+        def items_before():
+            items = HackerNewsItem.objects.order_by('-id')[:limit]
+            rows = [HackerNewsItemSchema.from_orm(item).dict() for item in items]
+            return len(rows), json.dumps(rows, cls=NinjaJSONEncoder)
+
+        def items_after():
+            rows = list(HackerNewsItem.objects.order_by('-id').values(*ITEM_FIELDS)[:limit])
+            return len(rows), renderer.render(None, rows, response_status=200)
+
+        def comments_before():
+            rows = []
+            for comment in HackerNewsComment.objects.filter(news_item__item_id=story.item_id):
+                rows.append(HackerNewsCommentSchema(
+                    id=comment.id,
+                    by=comment.by,
+                    item_id=comment.item_id,
+                    text=comment.text,
+                    parent=comment.parent.id if comment.parent else None,
+                    children=[]
+                ).dict())
+            return len(rows), json.dumps(rows, cls=NinjaJSONEncoder)
+
+        def comments_after():
+            rows = [
+                {'id': comment['id'], 'by': comment['by'], 'item_id': comment['item_id'],
+                 'text': comment['text'], 'parent': comment['parent_id'], 'children': []}
+                for comment in HackerNewsComment.objects.filter(news_item_id=story.item_id)
+                .values('id', 'by', 'item_id', 'text', 'parent_id')
+            ]
+            return len(rows), renderer.render(None, rows, response_status=200)
+
+        for name, before, after in (
+            ('list_items', items_before, items_after),
+            ('comments', comments_before, comments_after),
+        ):
+            before_rate = self.measure(before, iterations)
+            after_rate = self.measure(after, iterations)
+            print(f'{name}: {before_rate:,.0f} rows/s before, {after_rate:,.0f} rows/s after ({after_rate / before_rate:.1f}x)')
+
+    def measure(self, run, iterations):
+        rows = 0
+        start = time.perf_counter()
+        for _ in range(iterations):
+            count, _ = run()
+            rows += count
+        return rows / (time.perf_counter() - start)
@@ -1,3 +1,4 @@
+from datetime import datetime
 from typing import List, Optional
 
 from ninja import FilterSchema, Schema
@@ -44,5 +45,48 @@ class HackerNewsCommentSchema(Schema):
     text: Optional[str]
     parent: Optional[int]
     children: Optional[List['HackerNewsCommentSchema']]
-  
-   
\ No newline at end of file
+
+
+class AuthorActivitySchema(Schema):
+    """
+    Schema for representing a story or comment in a user's activity.
+    """
+    kind: str
+    item_id: int
+    story_id: Optional[int]
+    title: Optional[str]
+    text: Optional[str]
+    posted_at: datetime
+
+
+class AuthorSchema(Schema):
+    """
+    Schema for representing a Hacker News user and a page of their activity.
+    """
+    name: str
+    story_count: int
+    comment_count: int
+    first_seen_at: Optional[datetime]
+    last_active_at: Optional[datetime]
+    activity: List[AuthorActivitySchema]
+    next_cursor: Optional[str]
+
+
+class ChangeSchema(Schema):
+    """
+    Schema for representing an entry of the change feed.
+    """
+    id: int
+    item_id: int
+    kind: str
+    action: str
+    version: int
+    created_at: datetime
+
+
+class ChangeFeedSchema(Schema):
+    """
+    Schema for representing a page of the change feed and the cursor to resume from.
+    """
+    changes: List[ChangeSchema]
+    cursor: int
@@ -0,0 +1,95 @@
+import json
+import time
+import uuid
+from datetime import datetime, timezone
+from decimal import Decimal
+from unittest import mock
+
+from django.test import SimpleTestCase, TestCase, override_settings
+from ninja.renderers import JSONRenderer
+
+from hackernews.apps.news.changes import comment_changes, record_changes
+from hackernews.apps.news.models import HackerNewsItem, ItemChange
+
+from . import api, renderers
+from .renderers import FastJSONRenderer
+from .schema import ChangeSchema
+
+
+class FastJSONRendererTests(SimpleTestCase):
+
+    data = {
+        'url': 'https://example.com/a/b?c=d',
+        'title': 'Café </script> ☕',
+        'posted_at': datetime(2024, 5, 1, 12, 30, 15, 123456, tzinfo=timezone.utc),
+        'ratio': Decimal('1.50'),
+        'id': uuid.UUID('12345678-1234-5678-1234-567812345678'),
+        'nested': [{'score': 1, 'dead': None, 'flag': True}],
+        'change': ChangeSchema(
+            id=1, item_id=2, kind='story', action='created', version=1,
+            created_at=datetime(2024, 5, 1, tzinfo=timezone.utc),
+        ),
+    }
+
+    def assert_matches_ninja(self, data):
+        expected = JSONRenderer().render(None, data, response_status=200)
+        content = FastJSONRenderer().render(None, data, response_status=200)
+        if isinstance(content, bytes):
+            content = content.decode()
+        self.assertEqual(json.loads(content), json.loads(expected))
+        self.assertNotIn('\\/', content)
+
+    def test_orjson_matches_the_default_renderer(self):
+        self.assertIsNotNone(renderers.orjson)
+        self.assert_matches_ninja(self.data)
+
+    def test_fallback_matches_the_default_renderer(self):
+        with mock.patch.object(renderers, 'orjson', None):
+            self.assert_matches_ninja(self.data)
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class ChangeFeedTests(TestCase):
+
+    url = '/api/v1/hackernews/changes'
+
+    def test_pages_follow_the_cursor(self):
+        record_changes(comment_changes(range(1, 6)))
+
+        first = self.client.get(self.url, {'limit': 3}).json()
+        self.assertEqual([change['item_id'] for change in first['changes']], [1, 2, 3])
+        self.assertEqual(first['cursor'], first['changes'][-1]['id'])
+
+        rest = self.client.get(self.url, {'since': first['cursor']}).json()
+        self.assertEqual([change['item_id'] for change in rest['changes']], [4, 5])
+        self.assertEqual(self.client.get(self.url, {'since': rest['cursor']}).json()['changes'], [])
+
+    def test_limit_is_capped(self):
+        record_changes(comment_changes(range(1, 121)))
+        self.assertEqual(len(self.client.get(self.url, {'limit': 1000}).json()['changes']), 100)
+        self.assertEqual(self.client.get(self.url, {'limit': 0}).status_code, 422)
+
+    def test_long_poll_returns_the_cursor_when_nothing_changed(self):
+        started = time.monotonic()
+        with mock.patch.object(api, 'CHANGES_POLL_INTERVAL', 0.05):
+            page = self.client.get(self.url, {'since': 7, 'timeout': 1}).json()
+        self.assertGreaterEqual(time.monotonic() - started, 1)
+        self.assertEqual(page, {'changes': [], 'cursor': 7})
+
+    def test_in_house_edits_bump_the_version(self):
+        payload = {'title': 'Show HN', 'by': 'alice', 'url': 'https://example.com/show'}
+        self.client.post('/api/v1/hackernews/items', payload, content_type='application/json')
+        item = HackerNewsItem.objects.get()
+
+        self.client.put(
+            f'/api/v1/hackernews/items/{item.item_id}', {**payload, 'title': 'Show HN: v2'},
+            content_type='application/json',
+        )
+        self.assertEqual(HackerNewsItem.objects.get().version, 2)
+        self.client.delete(f'/api/v1/hackernews/items/{item.item_id}')
+        self.assertFalse(HackerNewsItem.objects.exists())
+
+        self.assertEqual(
+            list(ItemChange.objects.filter(item_id=item.item_id).order_by('id').values_list('action', 'version')),
+            [(ItemChange.CREATED, 1), (ItemChange.UPDATED, 2), (ItemChange.DELETED, 3)],
+        )
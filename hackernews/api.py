@@ -1,7 +1,8 @@
 from ninja import NinjaAPI
 
 from api.api import router as hackernews_router
+from api.renderers import renderer
 
-api = NinjaAPI()
+api = NinjaAPI(renderer=renderer)
 
 api.add_router('v1/hackernews', hackernews_router)
\ No newline at end of file
@@ -1,18 +1,64 @@
 from django.contrib import admin
 
-from .models import HackerNewsComment, HackerNewsItem
+from .models import (ArchivedStory, HackerNewsAuthor, HackerNewsComment,
+                     HackerNewsItem, ItemChange)
+
+
+class AuthorListFilter(admin.SimpleListFilter):
+    """
+    Filter by author, offering the most active authors from the author index.
+
+    Replaces list_filter = ('by',), which ran a DISTINCT over the whole table.
+    """
+    title = 'author'
+    parameter_name = 'by'
+    order_field = '-last_active_at'
+    max_choices = 50
+
+    def lookups(self, request, model_admin):
+        names = HackerNewsAuthor.objects.order_by(self.order_field).values_list('name', flat=True)[:self.max_choices]
+        return [(name, name) for name in names]
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(by=self.value())
+        return queryset
+
+class StoryAuthorListFilter(AuthorListFilter):
+    order_field = '-story_count'
+
+class CommentAuthorListFilter(AuthorListFilter):
+    order_field = '-comment_count'
 
 
 # Register your models here.
 class HackerNewsItemAdmin(admin.ModelAdmin):
-    list_display = ('item_id', 'title', 'by', 'score', 'descendants', 'item_type')
-    list_filter = ('by',)
+    list_display = ('item_id', 'title', 'by', 'score', 'descendants', 'stored_comment_count', 'max_depth', 'last_comment_at', 'item_type')
+    list_filter = (StoryAuthorListFilter,)
     search_fields = ('title', 'score', 'descendants')
     ordering = ('-id',)
 class HackerNewsCommentAdmin(admin.ModelAdmin):
     list_display = ('item_id', 'by', 'parent', 'news_item')
-    list_filter = ('by', 'news_item')
+    list_filter = (CommentAuthorListFilter, 'news_item')
     search_fields = ('text', 'by')
 
+class ArchivedStoryAdmin(admin.ModelAdmin):
+    list_display = ('item_id', 'title', 'archive_date', 'archived_at')
+    search_fields = ('title',)
+    ordering = ('-archive_date',)
+
+class HackerNewsAuthorAdmin(admin.ModelAdmin):
+    list_display = ('name', 'story_count', 'comment_count', 'first_seen_at', 'last_active_at')
+    search_fields = ('name',)
+    ordering = ('-last_active_at',)
+
+class ItemChangeAdmin(admin.ModelAdmin):
+    list_display = ('id', 'item_id', 'kind', 'action', 'version', 'created_at')
+    list_filter = ('kind', 'action')
+    ordering = ('-id',)
+
 admin.site.register(HackerNewsItem, HackerNewsItemAdmin)
 admin.site.register(HackerNewsComment, HackerNewsCommentAdmin)
+admin.site.register(ArchivedStory, ArchivedStoryAdmin)
+admin.site.register(HackerNewsAuthor, HackerNewsAuthorAdmin)
+admin.site.register(ItemChange, ItemChangeAdmin)
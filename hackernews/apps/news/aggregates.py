@@ -0,0 +1,98 @@
+from django.db import transaction
+from django.db.models import Count, DateTimeField, F, Max, Value
+from django.db.models.functions import Coalesce, Greatest
+
+from hackernews.db import use_primary
+
+from .models import HackerNewsComment, HackerNewsItem
+
+
+def add_comments_to_aggregates(story_item_id, comments):
+    """
+    Fold a batch of newly stored comments into their story's aggregates.
+
+    Uses F expressions so concurrent batches for the same story add up
+    correctly without reading the row first.
+
+    Args:
+        story_item_id (int): The Hacker News id of the story.
+        comments (list): The HackerNewsComment instances just created.
+    """
+    if not comments:
+        return
+
+    updates = {
+        'stored_comment_count': F('stored_comment_count') + len(comments),
+        'max_depth': Greatest('max_depth', Value(max(comment.depth for comment in comments))),
+    }
+
+    posted = [comment.posted_at for comment in comments if comment.posted_at]
+    if posted:
+        latest = Value(max(posted), output_field=DateTimeField())
+        # GREATEST returns NULL on SQLite when last_comment_at is still NULL
+        updates['last_comment_at'] = Coalesce(Greatest('last_comment_at', latest), latest)
+
+    HackerNewsItem.objects.filter(item_id=story_item_id).update(**updates)
+
+
+@use_primary()
+def compute_comment_depths():
+    """
+    Recompute the depth of every stored comment from its parent chain.
+
+    Returns:
+        int: The number of comments whose depth changed.
+    """
+    rows = HackerNewsComment.objects.values_list('id', 'parent_id', 'depth')
+    parents = {pk: parent_id for pk, parent_id, _ in rows}
+    stored_depths = {pk: depth for pk, _, depth in rows}
+
+    depths = {}
+    for pk in parents:
+        chain = []
+        node = pk
+        while node is not None and node not in depths:
+            chain.append(node)
+            node = parents.get(node)
+        # Top-level comments have depth 0
+        depth = depths[node] if node is not None else -1
+        for comment_id in reversed(chain):
+            depth += 1
+            depths[comment_id] = depth
+
+    changed = [HackerNewsComment(id=pk, depth=depth) for pk, depth in depths.items() if stored_depths[pk] != depth]
+    HackerNewsComment.objects.bulk_update(changed, ['depth'], batch_size=500)
+    return len(changed)
+
+
+@use_primary()
+@transaction.atomic
+def recompute_comment_aggregates():
+    """
+    Rebuild stored_comment_count, max_depth and last_comment_at for every story.
+
+    The aggregates come from one grouped query over the comments table.
+
+    Returns:
+        int: The number of stories with stored comments.
+    """
+    grouped = (
+        HackerNewsComment.objects.filter(news_item__isnull=False)
+        .values('news_item_id')
+        .annotate(count=Count('id'), depth=Max('depth'), last=Max('posted_at'))
+    )
+    aggregates = {row['news_item_id']: row for row in grouped}
+
+    HackerNewsItem.objects.update(stored_comment_count=0, max_depth=0, last_comment_at=None)
+
+    items = []
+    for pk, item_id in HackerNewsItem.objects.filter(item_id__in=aggregates).values_list('id', 'item_id'):
+        row = aggregates[item_id]
+        items.append(HackerNewsItem(
+            id=pk,
+            stored_comment_count=row['count'],
+            max_depth=row['depth'],
+            last_comment_at=row['last'],
+        ))
+    HackerNewsItem.objects.bulk_update(items, ['stored_comment_count', 'max_depth', 'last_comment_at'], batch_size=500)
+    return len(items)
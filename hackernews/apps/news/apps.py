@@ -4,3 +4,12 @@ from django.apps import AppConfig
 class NewsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'hackernews.apps.news'
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+
+        from hackernews.db import configure_sqlite
+
+        from . import store  # noqa: F401 -- connects the items_changed receiver
+
+        connection_created.connect(configure_sqlite)
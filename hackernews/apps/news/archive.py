@@ -0,0 +1,246 @@
+import gzip
+import json
+import os
+import uuid
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from functools import lru_cache
+from pathlib import Path
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, transaction
+from django.utils import timezone
+
+from hackernews.db import use_primary
+
+from .authors import refresh_authors
+from .changes import comment_changes, record_changes
+from .models import ArchivedStory, HackerNewsComment, HackerNewsItem, ItemChange
+from .signals import items_changed
+
+ARCHIVE_LOCK_KEY = 'hackernews:archive:lock'
+ARCHIVE_LOCK_TIMEOUT = 60 * 60
+
+
+class ArchiveEncoder(DjangoJSONEncoder):
+    """
+    DjangoJSONEncoder that keeps the microseconds of datetimes, which it rounds to milliseconds.
+
+    """
+
+    def default(self, o):
+        if isinstance(o, datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+def archive_path(day, root=None):
+    """
+    Return the compressed archive file holding the stories posted on a day.
+
+    Args:
+        day (date): The day the stories were posted.
+        root (str, optional): The archive directory. Defaults to the configured root.
+
+    Returns:
+        Path: The path of the per-day archive file.
+    """
+    root = Path(root or settings.HACKERNEWS_ARCHIVE['root'])
+    return root / f'{day:%Y}' / f'{day:%Y-%m-%d}.json.gz'
+
+
+def read_archive_file(path):
+    """
+    Read a per-day archive file.
+
+    Args:
+        path (Path): The archive file.
+
+    Returns:
+        dict: The archived stories keyed by their Hacker News id as a string.
+    """
+    if not path.exists():
+        return {}
+    return _read_archive_file(str(path), path.stat().st_mtime)
+
+
+@lru_cache(maxsize=16)
+def _read_archive_file(path, mtime):
+    with gzip.open(path, 'rt', encoding='utf-8') as archive_file:
+        return json.load(archive_file)
+
+
+def write_archive_file(path, stories):
+    """
+    Atomically write a per-day archive file.
+
+    Args:
+        path (Path): The archive file.
+        stories (dict): The archived stories keyed by their Hacker News id as a string.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix('.tmp')
+    with gzip.open(tmp_path, 'wt', encoding='utf-8') as archive_file:
+        json.dump(stories, archive_file, cls=ArchiveEncoder)
+    os.replace(tmp_path, path)
+
+
+@use_primary()
+@contextmanager
+def archive_lock():
+    """
+    Hold the cross-process archive lock, kept in the shared cache, for the duration of the block.
+
+    The per-day files are read, merged and written back, so two runs at once
+    would lose each other's stories.
+
+    Yields:
+        bool: Whether the lock was acquired; when False another run is archiving.
+    """
+    owner = uuid.uuid4().hex
+    acquired = cache.add(ARCHIVE_LOCK_KEY, owner, timeout=ARCHIVE_LOCK_TIMEOUT)
+    try:
+        yield acquired
+    finally:
+        if acquired and cache.get(ARCHIVE_LOCK_KEY) == owner:
+            cache.delete(ARCHIVE_LOCK_KEY)
+
+
+def archive_stories(retention_days=None, now=None):
+    """
+    Move stories older than the retention period, with their comments, to the archive.
+
+    Stories are grouped by the day they were posted and merged into that
+    day's compressed JSON file, then removed from the hot tables. Each
+    archived story keeps a row in ArchivedStory so reads can find it again.
+
+    Args:
+        retention_days (int, optional): How many days of stories stay in the hot tables.
+        now (datetime, optional): The reference time. Defaults to timezone.now().
+
+    Returns:
+        int: The number of stories archived, or None when another run holds the archive lock.
+    """
+    options = settings.HACKERNEWS_ARCHIVE
+    retention_days = options['retention_days'] if retention_days is None else retention_days
+    cutoff = (now or timezone.now()) - timedelta(days=retention_days)
+
+    stories = HackerNewsItem.objects.filter(posted_at__lt=cutoff, in_house=False).order_by('posted_at')
+    archived = 0
+    with archive_lock() as acquired:
+        if not acquired:
+            return None
+        while True:
+            batch = list(stories.values()[:options['batch_size']])
+            if not batch:
+                break
+            archive_batch(batch, options['root'])
+            archived += len(batch)
+
+    if archived:
+        items_changed.send(sender=HackerNewsItem)
+    return archived
+
+
+def archive_batch(stories, root):
+    """
+    Archive one batch of stories and delete them from the hot tables.
+
+    Args:
+        stories (list): The story rows, as returned by values().
+        root (str): The archive directory.
+    """
+    item_ids = [story['item_id'] for story in stories]
+    comments = defaultdict(list)
+    for comment in HackerNewsComment.objects.filter(news_item_id__in=item_ids).order_by('id').values():
+        comments[comment['news_item_id']].append(comment)
+
+    by_day = defaultdict(list)
+    for story in stories:
+        story['comments'] = comments[story['item_id']]
+        by_day[timezone.localdate(story['posted_at'])].append(story)
+
+    with transaction.atomic():
+        for day, day_stories in by_day.items():
+            path = archive_path(day, root)
+            archived = dict(read_archive_file(path))
+            archived.update({str(story['item_id']): story for story in day_stories})
+            write_archive_file(path, archived)
+
+            ArchivedStory.objects.bulk_create([
+                ArchivedStory(item_id=story['item_id'], story_pk=story['id'], title=story['title'], archive_date=day)
+                for story in day_stories
+            ], ignore_conflicts=True)
+
+        # Cascades to the comment trees
+        HackerNewsItem.objects.filter(item_id__in=item_ids).delete()
+
+        refresh_authors(
+            [story['by'] for story in stories]
+            + [comment['by'] for story_comments in comments.values() for comment in story_comments]
+        )
+
+        # Last, the change log lock is held until the commit
+        record_changes([
+            ItemChange(
+                item_id=story['item_id'], kind=story['item_type'] or 'story',
+                action=ItemChange.DELETED, version=story['version'] + 1,
+            )
+            for story in stories
+        ] + comment_changes(
+            [comment['item_id'] for story_comments in comments.values() for comment in story_comments],
+            ItemChange.DELETED,
+        ))
+
+
+def compact_database():
+    """
+    Give the space freed by archiving back to the database.
+
+    """
+    with connection.cursor() as cursor:
+        cursor.execute('VACUUM')
+
+
+def _rehydrate(model, row):
+    values = {}
+    for field in model._meta.concrete_fields:
+        if field.attname in row:
+            values[field.attname] = field.to_python(row[field.attname])
+    return model(**values)
+
+
+def load_archived_story(item_id=None, story_pk=None):
+    """
+    Rehydrate an archived story and its comments as unsaved model instances.
+
+    Lets the read paths serve archived stories as if they were still stored.
+
+    Args:
+        item_id (int, optional): The Hacker News id of the story.
+        story_pk (int, optional): The primary key the story had before archiving.
+
+    Returns:
+        tuple: The HackerNewsItem and its list of HackerNewsComment, or None when not archived.
+    """
+    lookup = {'item_id': item_id} if item_id is not None else {'story_pk': story_pk}
+    entry = ArchivedStory.objects.filter(**lookup).first()
+    if entry is None:
+        return None
+
+    story = read_archive_file(archive_path(entry.archive_date)).get(str(entry.item_id))
+    if story is None:
+        return None
+
+    news_item = _rehydrate(HackerNewsItem, story)
+    comments = {}
+    for row in story.get('comments', []):
+        comment = _rehydrate(HackerNewsComment, row)
+        comment.news_item = news_item
+        comment.parent = comments.get(comment.parent_id)
+        comments[comment.id] = comment
+
+    return news_item, list(comments.values())
@@ -0,0 +1,150 @@
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import datetime, timezone
+
+from django.db.models import Count, Max, Min, Q
+
+from hackernews.db import use_primary
+
+from .models import HackerNewsAuthor, HackerNewsComment, HackerNewsItem
+
+BATCH_SIZE = 500
+
+
+@use_primary()
+def refresh_authors(names):
+    """
+    Recompute the HackerNewsAuthor rows of the given users from what is stored.
+
+    Uses one grouped query per table and batch of names, and upserts the
+    results, so calling it again for the same names is harmless.
+
+    Args:
+        names (iterable): The usernames to refresh.
+
+    Returns:
+        int: The number of authors written.
+    """
+    names = sorted({name for name in names if name})
+    written = 0
+    for start in range(0, len(names), BATCH_SIZE):
+        batch = names[start:start + BATCH_SIZE]
+        stats = {name: {'story_count': 0, 'comment_count': 0, 'first': [], 'last': []} for name in batch}
+
+        for model, count_field in ((HackerNewsItem, 'story_count'), (HackerNewsComment, 'comment_count')):
+            grouped = (
+                model.objects.filter(by__in=batch)
+                .values('by')
+                .annotate(count=Count('id'), first=Min('posted_at'), last=Max('posted_at'))
+            )
+            for row in grouped:
+                author = stats[row['by']]
+                author[count_field] = row['count']
+                if row['first']:
+                    author['first'].append(row['first'])
+                if row['last']:
+                    author['last'].append(row['last'])
+
+        authors = [
+            HackerNewsAuthor(
+                name=name,
+                story_count=author['story_count'],
+                comment_count=author['comment_count'],
+                first_seen_at=min(author['first'], default=None),
+                last_active_at=max(author['last'], default=None),
+            )
+            for name, author in stats.items()
+        ]
+        HackerNewsAuthor.objects.bulk_create(
+            authors,
+            update_conflicts=True,
+            unique_fields=['name'],
+            update_fields=['story_count', 'comment_count', 'first_seen_at', 'last_active_at'],
+        )
+        written += len(authors)
+    return written
+
+
+@use_primary()
+def rebuild_authors():
+    """
+    Rebuild the author table from every stored story and comment.
+
+    Returns:
+        int: The number of authors written.
+    """
+    names = set(HackerNewsItem.objects.exclude(by=None).values_list('by', flat=True).distinct())
+    names.update(HackerNewsComment.objects.exclude(by=None).values_list('by', flat=True).distinct())
+    return refresh_authors(names)
+
+
+def encode_cursor(posted_at, item_id):
+    """
+    Encode the position of an activity entry as an opaque cursor.
+
+    Args:
+        posted_at (datetime): The time of the entry.
+        item_id (int): The Hacker News id of the entry.
+
+    Returns:
+        str: The cursor.
+    """
+    return urlsafe_b64encode(f'{posted_at.timestamp()}:{item_id}'.encode()).decode()
+
+
+def decode_cursor(cursor):
+    """
+    Decode a cursor made by encode_cursor().
+
+    Args:
+        cursor (str): The cursor.
+
+    Returns:
+        tuple: The datetime and item id, or None for an invalid cursor.
+    """
+    try:
+        timestamp, item_id = urlsafe_b64decode(cursor.encode()).decode().split(':')
+        return datetime.fromtimestamp(float(timestamp), tz=timezone.utc), int(item_id)
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+def author_activity(name, cursor=None, limit=20):
+    """
+    Return a page of a user's stories and comments, newest first.
+
+    Each table is read through its (by, posted_at) index and the two pages
+    are merged, so the cost does not depend on how active the user is.
+
+    Args:
+        name (str): The username.
+        cursor (str, optional): The next_cursor of the previous page.
+        limit (int, optional): The page size. Defaults to 20.
+
+    Returns:
+        tuple: The activity entries as dicts, and the cursor of the next page or None.
+    """
+    position = decode_cursor(cursor) if cursor else None
+
+    def page(model, values):
+        queryset = model.objects.filter(by=name, posted_at__isnull=False)
+        if position:
+            posted_at, item_id = position
+            queryset = queryset.filter(Q(posted_at__lt=posted_at) | Q(posted_at=posted_at, item_id__lt=item_id))
+        return list(queryset.order_by('-posted_at', '-item_id').values(*values)[:limit + 1])
+
+    stories = [
+        {'kind': 'story', 'story_id': row['item_id'], 'text': None, **row}
+        for row in page(HackerNewsItem, ['item_id', 'title', 'posted_at'])
+    ]
+    comments = [
+        {'kind': 'comment', 'story_id': row.pop('news_item_id'), 'title': None, **row}
+        for row in page(HackerNewsComment, ['item_id', 'text', 'news_item_id', 'posted_at'])
+    ]
+
+    activity = sorted(stories + comments, key=lambda entry: (entry['posted_at'], entry['item_id']), reverse=True)
+    next_cursor = None
+    if len(activity) > limit:
+        activity = activity[:limit]
+        last = activity[-1]
+        next_cursor = encode_cursor(last['posted_at'], last['item_id'])
+    return activity, next_cursor
@@ -0,0 +1,92 @@
+from django.db import connections, router, transaction
+
+from .models import ItemChange
+
+CHANGE_FIELDS = ('id', 'item_id', 'kind', 'action', 'version', 'created_at')
+
+
+def story_change(item, action):
+    """
+    Build the change entry of a story.
+
+    Args:
+        item (HackerNewsItem): The story.
+        action (str): One of ItemChange.CREATED, UPDATED or DELETED.
+
+    Returns:
+        ItemChange: The unsaved change entry.
+    """
+    return ItemChange(item_id=item.item_id, kind=item.item_type or 'story', action=action, version=item.version)
+
+
+def comment_changes(comment_ids, action=ItemChange.CREATED):
+    """
+    Build the change entries of comments being created or deleted.
+
+    Comments are never updated, so their deletion is their second version.
+
+    Args:
+        comment_ids (list): The Hacker News ids of the comments.
+        action (str, optional): ItemChange.CREATED or ItemChange.DELETED. Defaults to CREATED.
+
+    Returns:
+        list: The unsaved change entries.
+    """
+    version = 1 if action == ItemChange.CREATED else 2
+    return [
+        ItemChange(item_id=comment_id, kind='comment', action=action, version=version)
+        for comment_id in comment_ids
+    ]
+
+
+def record_changes(changes):
+    """
+    Append entries to the change log.
+
+    Consumers page through the log by id, so on PostgreSQL writers take a
+    table lock until their transaction commits: an id can then never become
+    visible after a higher one, which a consumer would already have passed.
+    Call it last in a transaction, to hold the lock for as short as possible.
+
+    Args:
+        changes (list): The unsaved ItemChange entries.
+    """
+    if not changes:
+        return
+
+    using = router.db_for_write(ItemChange)
+    with transaction.atomic(using=using):
+        connection = connections[using]
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                # Conflicts with itself and with inserts, not with the readers
+                cursor.execute(f'LOCK TABLE {ItemChange._meta.db_table} IN SHARE ROW EXCLUSIVE MODE')
+        ItemChange.objects.using(using).bulk_create(changes)
+
+
+def changes_since(cursor, limit=100):
+    """
+    Return the change entries after a cursor, oldest first.
+
+    Args:
+        cursor (int): The id of the last change already seen, 0 for the start of the log.
+        limit (int, optional): The maximum number of entries. Defaults to 100.
+
+    Returns:
+        QuerySet: The entries as dicts.
+    """
+    return ItemChange.objects.filter(id__gt=cursor).order_by('id').values(*CHANGE_FIELDS)[:limit]
+
+
+def prune_changes(before):
+    """
+    Drop change entries older than a point in time.
+
+    Args:
+        before (datetime): Entries created before this are deleted.
+
+    Returns:
+        int: The number of entries deleted.
+    """
+    deleted, _ = ItemChange.objects.filter(created_at__lt=before).delete()
+    return deleted
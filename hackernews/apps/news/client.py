@@ -0,0 +1,111 @@
+import asyncio
+import atexit
+import threading
+import weakref
+
+import aiohttp
+from django.conf import settings
+
+HACKERNEWS_API_URL = 'https://hacker-news.firebaseio.com/v0'
+
+
+class HackerNewsClient:
+    """
+    Process-wide manager for the aiohttp ClientSession used by the fetchers.
+
+    aiohttp sessions are bound to the event loop they were created on, so one
+    pooled session is kept per running loop. Every crawl running on the same
+    loop (the daphne server loop, or the persistent loop of a Django-Q worker)
+    shares that session, its keep-alive connections and its DNS cache.
+    Sessions left behind by loops that have since closed, e.g. the ones of
+    asyncio.run() or async_to_sync(), are discarded.
+
+    """
+
+    def __init__(self):
+        self._sessions = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    def get_session(self):
+        """
+        Return the shared session for the running event loop, creating it if needed.
+
+        Returns:
+            aiohttp.ClientSession: The pooled session for the current loop.
+        """
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            stale = [(other, session) for other, session in self._sessions.items() if other.is_closed()]
+            for other, session in stale:
+                del self._sessions[other]
+                self._discard(session)
+
+            session = self._sessions.get(loop)
+            if session is None or session.closed:
+                session = self._create_session()
+                self._sessions[loop] = session
+        return session
+
+    def _create_session(self):
+        """
+        Build a ClientSession with keep-alive pooling and DNS caching enabled.
+
+        """
+        options = settings.HACKERNEWS_HTTP
+        connector = aiohttp.TCPConnector(
+            limit=options['pool_size'],
+            limit_per_host=options['pool_size_per_host'],
+            ttl_dns_cache=options['dns_cache_ttl'],
+            keepalive_timeout=options['keepalive_timeout'],
+            enable_cleanup_closed=True,
+        )
+        timeout = aiohttp.ClientTimeout(total=options['timeout'])
+        return aiohttp.ClientSession(connector=connector, timeout=timeout)
+
+    @staticmethod
+    def _discard(session):
+        """
+        Release a session whose loop is closed, where session.close() can no longer run.
+
+        """
+        connector = session.connector
+        session.detach()
+        if connector is not None and not connector.closed:
+            # close() schedules work on the connector's loop, _close() only drops the transports
+            connector._close()
+
+    async def close(self):
+        """
+        Close the session bound to the running event loop, if any.
+
+        """
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            session = self._sessions.pop(loop, None)
+        if session is not None and not session.closed:
+            await session.close()
+
+    def shutdown(self):
+        """
+        Close every session left open. Registered with atexit.
+
+        """
+        with self._lock:
+            sessions = list(self._sessions.items())
+            self._sessions.clear()
+
+        for loop, session in sessions:
+            if session.closed or loop.is_running():
+                continue
+            if loop.is_closed():
+                self._discard(session)
+                continue
+            try:
+                loop.run_until_complete(session.close())
+            except RuntimeError:
+                self._discard(session)
+
+
+client = HackerNewsClient()
+
+atexit.register(client.shutdown)
@@ -0,0 +1,139 @@
+import asyncio
+import threading
+import time
+import weakref
+
+from django.conf import settings
+
+COUNTERS = ('item_requests', 'upstream_fetches', 'coalesced_requests', 'negative_cache_hits')
+
+
+def is_gone(item):
+    """
+    Tell whether an item payload means the item is missing, deleted or dead.
+
+    Args:
+        item (dict): The item JSON, or None.
+
+    Returns:
+        bool: True when there is nothing worth asking the API for again soon.
+    """
+    return not item or bool(item.get('deleted') or item.get('dead'))
+
+
+def coalescing_ratio(counters):
+    """
+    Share of item requests answered without a call to the source.
+
+    Args:
+        counters (dict): Counters filled in by ItemRequestCoalescer.fetch.
+
+    Returns:
+        float: The ratio, 0.0 when nothing was requested yet.
+    """
+    requests = counters.get('item_requests', 0)
+    if not requests:
+        return 0.0
+    return (counters.get('coalesced_requests', 0) + counters.get('negative_cache_hits', 0)) / requests
+
+
+class ItemRequestCoalescer:
+    """
+    Process-wide single-flight layer in front of the item sources.
+
+    Concurrent requests for the same item share one call to the source and
+    one parsed result. Pending calls are tracked per loop because their tasks
+    are bound to it, and nothing is shared between processes: the scheduled
+    tasks run in the Django-Q workers and manual crawls in the web process.
+    Items that came back missing, deleted or dead are remembered for
+    negative_cache_ttl seconds.
+
+    Sources that set a coalesce_key share their results with every other
+    source that has the same key, others only with themselves.
+
+    """
+
+    def __init__(self):
+        self._inflight = weakref.WeakKeyDictionary()
+        self._negative = {}
+        self._lock = threading.Lock()
+        self.stats = dict.fromkeys(COUNTERS, 0)
+
+    async def fetch(self, source, item_id, counters=None):
+        """
+        Fetch an item through the source, joining a pending call for it if there is one.
+
+        Args:
+            source (ItemSource): The source to fetch from.
+            item_id (int): The Hacker News item id.
+            counters (dict, optional): Extra counters to update, e.g. a fetcher's progress.
+
+        Returns:
+            dict: The item JSON, or None when the item does not exist.
+        """
+        key = (getattr(source, 'coalesce_key', source), item_id)
+        self._count('item_requests', counters)
+
+        cached = self._negative.get(key)
+        if cached is not None:
+            expires_at, item = cached
+            if expires_at > time.monotonic():
+                self._count('negative_cache_hits', counters)
+                return item
+            self._negative.pop(key, None)
+
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            pending = self._inflight.setdefault(loop, {})
+        task = pending.get(key)
+        if task is None:
+            self._count('upstream_fetches', counters)
+            task = loop.create_task(self._fetch(source, key, pending))
+            pending[key] = task
+        else:
+            self._count('coalesced_requests', counters)
+
+        # A cancelled caller must not cancel the call the others are waiting on
+        return await asyncio.shield(task)
+
+    async def _fetch(self, source, key, pending):
+        try:
+            item = await source.fetch_item(key[1])
+        finally:
+            pending.pop(key, None)
+
+        if is_gone(item):
+            self._remember_gone(key, item)
+        return item
+
+    def _remember_gone(self, key, item):
+        options = settings.HACKERNEWS_HTTP
+        ttl = options['negative_cache_ttl']
+        if ttl <= 0:
+            return
+
+        now = time.monotonic()
+        with self._lock:
+            if len(self._negative) >= options['negative_cache_size']:
+                self._negative = {k: v for k, v in self._negative.items() if v[0] > now}
+                if len(self._negative) >= options['negative_cache_size']:
+                    # Still full of live entries, drop the oldest one
+                    self._negative.pop(next(iter(self._negative)))
+            self._negative[key] = (now + ttl, item)
+
+    def _count(self, name, counters):
+        self.stats[name] += 1
+        if counters is not None:
+            counters[name] = counters.get(name, 0) + 1
+
+    def clear(self):
+        """
+        Forget the negative cache and reset the counters.
+
+        """
+        with self._lock:
+            self._negative = {}
+            self.stats = dict.fromkeys(COUNTERS, 0)
+
+
+inflight = ItemRequestCoalescer()
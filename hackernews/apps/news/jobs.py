@@ -0,0 +1,155 @@
+import asyncio
+import uuid
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Optional
+
+from django.core.cache import cache
+from django.utils import timezone
+
+from .inflight import coalescing_ratio
+from .utils import HackerNewsFetcher
+
+CRAWL_LOCK_KEY = 'hackernews:crawl:lock'
+# Outlives the Django-Q task timeout, so a crashed worker cannot hold the lock for long
+CRAWL_LOCK_TIMEOUT = 15 * 60
+
+
+@asynccontextmanager
+async def crawl_lock(owner):
+    """
+    Hold the cross-process crawl lock, kept in the shared cache, for the duration of the block.
+
+    Args:
+        owner (str): A unique id of the crawl taking the lock.
+
+    Yields:
+        bool: Whether the lock was acquired; when False another crawl is running.
+    """
+    try:
+        acquired = await cache.aadd(CRAWL_LOCK_KEY, owner, timeout=CRAWL_LOCK_TIMEOUT)
+    except BaseException:
+        # Cancelled while the add ran in its thread, it may still have taken the lock
+        if await cache.aget(CRAWL_LOCK_KEY) == owner:
+            await cache.adelete(CRAWL_LOCK_KEY)
+        raise
+    try:
+        yield acquired
+    finally:
+        if acquired and await cache.aget(CRAWL_LOCK_KEY) == owner:
+            await cache.adelete(CRAWL_LOCK_KEY)
+
+
+@dataclass
+class CrawlJob:
+    """
+    State of a single background crawl started from FetchHackerNewsView.
+
+    """
+    id: str
+    status: str = 'pending'
+    created_at: object = field(default_factory=timezone.now)
+    finished_at: Optional[object] = None
+    error: Optional[str] = None
+    fetcher: HackerNewsFetcher = field(default_factory=HackerNewsFetcher)
+    # The loop only keeps weak references to its tasks
+    task: Optional[asyncio.Task] = field(default=None, repr=False)
+
+    @property
+    def is_active(self):
+        return self.status in ('pending', 'running')
+
+    def as_dict(self):
+        """
+        Serialize the job for the status and event endpoints.
+
+        Returns:
+            dict: The job status and progress counters.
+        """
+        return {
+            'id': self.id,
+            'status': self.status,
+            'created_at': self.created_at.isoformat(),
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+            'error': self.error,
+            'progress': dict(self.fetcher.progress, coalescing_ratio=round(coalescing_ratio(self.fetcher.progress), 3)),
+        }
+
+
+class CrawlJobManager:
+    """
+    In-process registry of crawl jobs.
+
+    Only one crawl runs at a time: enqueueing while a job is active returns
+    that job instead of starting a duplicate. Crawls running in other
+    processes, e.g. the scheduled one in a Django-Q worker, hold the shared
+    crawl_lock; a job started meanwhile ends as 'skipped'. Finished jobs are
+    kept for a while so clients can still poll their final status.
+
+    """
+
+    max_finished_jobs = 20
+
+    def __init__(self):
+        self._jobs = {}
+        self._active = None
+
+    def enqueue(self):
+        """
+        Start a crawl on the running event loop, or return the one already running.
+
+        Returns:
+            tuple: The CrawlJob and a flag telling whether it was newly created.
+        """
+        if self._active is not None and self._active.is_active and not self._active.task.done():
+            return self._active, False
+
+        job = CrawlJob(id=uuid.uuid4().hex)
+        self._jobs[job.id] = job
+        self._active = job
+        job.task = asyncio.get_running_loop().create_task(self._run(job))
+        self._prune()
+        return job, True
+
+    def get(self, job_id):
+        """
+        Look up a job by id.
+
+        Args:
+            job_id (str): The job id returned by enqueue().
+
+        Returns:
+            CrawlJob or None: The job, if it is still known.
+        """
+        return self._jobs.get(job_id)
+
+    async def _run(self, job):
+        job.status = 'running'
+        try:
+            async with crawl_lock(job.id) as acquired:
+                if not acquired:
+                    job.status = 'skipped'
+                    job.error = 'Another crawl is already running'
+                    return
+                await job.fetcher.run()
+        except Exception as e:
+            job.status = 'failed'
+            job.error = str(e)
+        except BaseException as e:
+            # Cancelled, or the coroutine was closed with its loop: never leave the job running
+            job.status = 'failed'
+            job.error = f'Interrupted ({type(e).__name__})'
+            raise
+        else:
+            if job.status == 'running':
+                job.status = 'completed'
+        finally:
+            job.finished_at = timezone.now()
+
+    def _prune(self):
+        finished = [job for job in self._jobs.values() if not job.is_active]
+        for job in finished[:-self.max_finished_jobs]:
+            del self._jobs[job.id]
+
+
+crawl_jobs = CrawlJobManager()
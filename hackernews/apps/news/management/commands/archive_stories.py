@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+
+from hackernews.apps.news.archive import archive_stories, compact_database
+
+
+class Command(BaseCommand):
+    """
+    Custom management command for archiving old stories and their comments.
+
+    Inherits from Django's BaseCommand class.
+    """
+    help = 'Move stories older than the retention period to the compressed per-day archive'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=None, help='Retention period in days, defaults to HACKERNEWS_ARCHIVE["retention_days"]')
+        parser.add_argument('--vacuum', action='store_true', help='Compact the database after archiving')
+
+    def handle(self, *args, **options):
+        """
+        Handle the execution of the command.
+
+        Archives the stories past the retention period and optionally compacts the database.
+
+        """
+        archived = archive_stories(retention_days=options['days'])
+        if archived is None:
+            print('Another archive run is in progress, skipped')
+            return
+        print(f'{archived} stories archived')
+
+        if options['vacuum'] and archived:
+            compact_database()
+            print('Database compacted')
@@ -0,0 +1,66 @@
+import asyncio
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from hackernews.apps.news.client import client
+from hackernews.apps.news.inflight import coalescing_ratio
+from hackernews.apps.news.sources import (HttpItemSource, RecordingItemSource,
+                                          ReplayItemSource,
+                                          SyntheticItemSource)
+from hackernews.apps.news.utils import HackerNewsFetcher
+
+
+class Command(BaseCommand):
+    """
+    Custom management command for running one crawl in the foreground.
+
+    Inherits from Django's BaseCommand class.
+    """
+    help = 'Run a single crawl from the live API, a recorded file or synthetic data, and report its throughput'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--source', choices=['http', 'replay', 'synthetic'], default='http')
+        parser.add_argument('--path', help='Recorded items file for --source replay')
+        parser.add_argument('--record', help='Record every item served into this file, for later replay')
+        parser.add_argument('--stories', type=int, default=100, help='Number of synthetic stories')
+        parser.add_argument('--seed', type=int, default=0, help='Seed of the synthetic data')
+
+    def handle(self, *args, **options):
+        """
+        Handle the execution of the command.
+
+        Builds the requested item source, runs the fetcher once and prints the elapsed time.
+
+        """
+        if options['source'] == 'replay':
+            if not options['path']:
+                raise CommandError('--source replay needs --path')
+            source = ReplayItemSource(options['path'])
+        elif options['source'] == 'synthetic':
+            source = SyntheticItemSource(stories=options['stories'], seed=options['seed'])
+        else:
+            source = HttpItemSource()
+
+        if options['record']:
+            source = RecordingItemSource(source, options['record'])
+
+        fetcher = HackerNewsFetcher(source=source)
+        start = time.perf_counter()
+        asyncio.run(self.crawl(fetcher))
+        elapsed = time.perf_counter() - start
+
+        progress = fetcher.progress
+        items = progress['stories_done'] + progress['comments_saved']
+        print(f"{progress['stories_done']} stories ({progress['stories_skipped']} stored ones not due skipped) and {progress['comments_saved']} new comments in {elapsed:.2f}s ({items / elapsed:.0f} items/s)")
+        print(
+            f"{progress['item_requests']} item requests, {progress['upstream_fetches']} sent to the source, "
+            f"{progress['coalesced_requests']} coalesced, {progress['negative_cache_hits']} negative cache hits "
+            f"(coalescing ratio {coalescing_ratio(progress):.1%})"
+        )
+
+    async def crawl(self, fetcher):
+        try:
+            await fetcher.run()
+        finally:
+            await client.close()
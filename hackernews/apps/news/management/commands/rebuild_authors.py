@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from hackernews.apps.news.authors import rebuild_authors
+
+
+class Command(BaseCommand):
+    """
+    Custom management command for rebuilding the author index.
+
+    Inherits from Django's BaseCommand class.
+    """
+    help = 'Rebuild the per-author counts and activity dates from the stored stories and comments'
+
+    def handle(self, *args, **options):
+        """
+        Handle the execution of the command.
+
+        """
+        authors = rebuild_authors()
+
+        print(f'{authors} authors rebuilt')
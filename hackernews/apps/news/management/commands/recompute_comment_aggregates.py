@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from hackernews.apps.news.aggregates import (compute_comment_depths,
+                                             recompute_comment_aggregates)
+
+
+class Command(BaseCommand):
+    """
+    Custom management command for repairing the per-story comment aggregates.
+
+    Inherits from Django's BaseCommand class.
+    """
+    help = 'Recompute stored comment counts, max depth and latest reply time for every story'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--depths', action='store_true', help='Also recompute comment depths from the parent chains first')
+
+    def handle(self, *args, **options):
+        """
+        Handle the execution of the command.
+
+        Rebuilds the aggregates from one grouped query over the comments table.
+
+        """
+        if options['depths']:
+            changed = compute_comment_depths()
+            print(f'{changed} comment depths updated')
+
+        stories = recompute_comment_aggregates()
+
+        print(f'Comment aggregates recomputed for {stories} stories')
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.2 on 2026-10-19 12:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0003_alter_hackernewscomment_parent'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='hackernewsitem',
+            name='posted_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='hackernewsitem',
+            name='rank_score',
+            field=models.FloatField(db_index=True, default=0),
+        ),
+    ]
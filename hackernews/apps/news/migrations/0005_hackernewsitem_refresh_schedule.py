@@ -0,0 +1,28 @@
+# Generated by Django 4.2.2 on 2026-10-19 12:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0004_hackernewsitem_ranking'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='hackernewsitem',
+            name='last_refreshed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='hackernewsitem',
+            name='next_refresh_at',
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='hackernewsitem',
+            name='score_velocity',
+            field=models.FloatField(default=0),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 4.2.2 on 2026-10-19 12:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0005_hackernewsitem_refresh_schedule'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='hackernewscomment',
+            name='depth',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='hackernewscomment',
+            name='posted_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='hackernewsitem',
+            name='last_comment_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='hackernewsitem',
+            name='max_depth',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='hackernewsitem',
+            name='stored_comment_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AlterField(
+            model_name='hackernewscomment',
+            name='item_id',
+            field=models.IntegerField(blank=True, db_index=True, null=True),
+        ),
+    ]
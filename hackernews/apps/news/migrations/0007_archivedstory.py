@@ -0,0 +1,24 @@
+# Generated by Django 4.2.2 on 2026-10-19 12:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0006_comment_aggregates'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedStory',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('item_id', models.IntegerField(unique=True)),
+                ('story_pk', models.BigIntegerField(db_index=True)),
+                ('title', models.CharField(blank=True, max_length=255, null=True)),
+                ('archive_date', models.DateField()),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+    ]
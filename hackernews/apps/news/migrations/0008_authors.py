@@ -0,0 +1,32 @@
+# Generated by Django 4.2.2 on 2026-10-19 12:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0007_archivedstory'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HackerNewsAuthor',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True)),
+                ('story_count', models.IntegerField(default=0)),
+                ('comment_count', models.IntegerField(default=0)),
+                ('first_seen_at', models.DateTimeField(blank=True, null=True)),
+                ('last_active_at', models.DateTimeField(blank=True, db_index=True, null=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='hackernewscomment',
+            index=models.Index(fields=['by', '-posted_at'], name='news_comment_by_posted_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='hackernewsitem',
+            index=models.Index(fields=['by', '-posted_at'], name='news_item_by_posted_idx'),
+        ),
+    ]
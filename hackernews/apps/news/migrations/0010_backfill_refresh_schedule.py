@@ -0,0 +1,23 @@
+from django.db import migrations
+from django.utils import timezone
+
+
+def schedule_unscheduled_stories(apps, schema_editor):
+    # Stories stored before 0004/0005 have neither posted_at nor next_refresh_at,
+    # so the refresh queue would never pick them up. Make them due now: the first
+    # refresh fills posted_at in and schedules them from their real age.
+    HackerNewsItem = apps.get_model('news', 'HackerNewsItem')
+    HackerNewsItem.objects.filter(
+        in_house=False, posted_at__isnull=True, next_refresh_at__isnull=True,
+    ).update(next_refresh_at=timezone.now())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0009_change_feed'),
+    ]
+
+    operations = [
+        migrations.RunPython(schedule_unscheduled_stories, migrations.RunPython.noop),
+    ]
@@ -11,6 +11,20 @@ class HackerNewsItem(models.Model):
     url = models.URLField(blank=True, null=True)
     item_type = models.CharField(max_length=255, blank=True, null=True)
     in_house = models.BooleanField(default=False)
+    posted_at = models.DateTimeField(blank=True, null=True)
+    rank_score = models.FloatField(default=0, db_index=True)
+    score_velocity = models.FloatField(default=0)
+    last_refreshed_at = models.DateTimeField(blank=True, null=True)
+    next_refresh_at = models.DateTimeField(blank=True, null=True, db_index=True)
+    stored_comment_count = models.IntegerField(default=0)
+    max_depth = models.IntegerField(default=0)
+    last_comment_at = models.DateTimeField(blank=True, null=True)
+    version = models.IntegerField(default=1)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['by', '-posted_at'], name='news_item_by_posted_idx'),
+        ]
 
     def __str__(self):
         return self.title
@@ -19,14 +33,59 @@ class HackerNewsItem(models.Model):
 class HackerNewsComment(models.Model):
 
     by = models.CharField(max_length=255, blank=True, null=True)
-    item_id = models.IntegerField(blank=True, null=True)
+    item_id = models.IntegerField(blank=True, null=True, db_index=True)
     text = models.TextField(blank=True, null=True)
     parent = models.ForeignKey('self', null=True, blank=True, on_delete=models.CASCADE)
     news_item = models.ForeignKey(HackerNewsItem, null=True, blank=True, related_name='comments', to_field='item_id', on_delete=models.CASCADE)
+    depth = models.IntegerField(default=0)
+    posted_at = models.DateTimeField(blank=True, null=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['by', '-posted_at'], name='news_comment_by_posted_idx'),
+        ]
 
     def __str__(self):
         parent_str = str(self.parent.id) if self.parent else "None"
         return f"{parent_str} - {self.item_id}"
 
 
+class ArchivedStory(models.Model):
+
+    item_id = models.IntegerField(unique=True)
+    story_pk = models.BigIntegerField(db_index=True)
+    title = models.CharField(max_length=255, blank=True, null=True)
+    archive_date = models.DateField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.item_id} - {self.archive_date}"
+
+
+class HackerNewsAuthor(models.Model):
+
+    name = models.CharField(max_length=255, unique=True)
+    story_count = models.IntegerField(default=0)
+    comment_count = models.IntegerField(default=0)
+    first_seen_at = models.DateTimeField(blank=True, null=True)
+    last_active_at = models.DateTimeField(blank=True, null=True, db_index=True)
+
+    def __str__(self):
+        return self.name
+
+
+class ItemChange(models.Model):
+
+    CREATED = 'created'
+    UPDATED = 'updated'
+    DELETED = 'deleted'
+    ACTION_CHOICES = [(CREATED, 'Created'), (UPDATED, 'Updated'), (DELETED, 'Deleted')]
+
+    item_id = models.IntegerField()
+    kind = models.CharField(max_length=16)
+    action = models.CharField(max_length=16, choices=ACTION_CHOICES)
+    version = models.IntegerField(default=1)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return f"{self.id}: {self.kind} {self.item_id} {self.action} v{self.version}"
@@ -0,0 +1,73 @@
+from datetime import timedelta
+
+import numpy as np
+from django.conf import settings
+from django.utils import timezone
+
+from hackernews.db import use_primary
+
+from .models import HackerNewsItem
+
+def hot_scores(scores, comments, age_hours, gravity=1.8, comment_weight=0.0, age_offset_hours=2):
+    """
+    Compute Hacker News style gravity scores for whole arrays at once.
+
+    score = (points - 1) / (age + offset) ** gravity, where points is the story
+    score plus comment_weight times its comment count.
+
+    Args:
+        scores (np.ndarray): The story scores.
+        comments (np.ndarray): The comment counts.
+        age_hours (np.ndarray): The story ages in hours.
+        gravity (float): How fast stories decay with age.
+        comment_weight (float): Points added per comment.
+        age_offset_hours (float): Offset added to the age so new stories don't divide by zero.
+
+    Returns:
+        np.ndarray: The hot scores.
+    """
+    points = np.maximum(scores + comment_weight * comments - 1, 0)
+    return points / np.power(np.maximum(age_hours, 0) + age_offset_hours, gravity)
+
+
+@use_primary()
+def refresh_rank_scores(now=None):
+    """
+    Recompute rank_score for every story younger than max_age_hours.
+
+    Stories that aged out of the window are reset to 0 so they sink below
+    everything still being ranked.
+
+    Args:
+        now (datetime, optional): The reference time. Defaults to timezone.now().
+
+    Returns:
+        int: The number of stories rescored.
+    """
+    options = settings.HACKERNEWS_RANKING
+    now = now or timezone.now()
+    cutoff = now - timedelta(hours=options['max_age_hours'])
+
+    HackerNewsItem.objects.filter(posted_at__lt=cutoff, rank_score__gt=0).update(rank_score=0)
+
+    rows = list(
+        HackerNewsItem.objects.filter(posted_at__gte=cutoff)
+        .values_list('id', 'score', 'descendants', 'posted_at')
+    )
+    if not rows:
+        return 0
+
+    ids, scores, comments, posted_at = zip(*rows)
+    ages = np.array([(now - posted).total_seconds() for posted in posted_at]) / 3600
+    ranks = hot_scores(
+        np.array([score or 0 for score in scores], dtype=float),
+        np.array([count or 0 for count in comments], dtype=float),
+        ages,
+        gravity=options['gravity'],
+        comment_weight=options['comment_weight'],
+        age_offset_hours=options['age_offset_hours'],
+    )
+
+    items = [HackerNewsItem(id=pk, rank_score=float(rank)) for pk, rank in zip(ids, ranks)]
+    HackerNewsItem.objects.bulk_update(items, ['rank_score'], batch_size=options['batch_size'])
+    return len(items)
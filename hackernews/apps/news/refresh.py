@@ -0,0 +1,194 @@
+import asyncio
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from hackernews.db import use_primary
+
+from .authors import refresh_authors
+from .changes import comment_changes, record_changes, story_change
+from .inflight import is_gone
+from .models import HackerNewsComment, HackerNewsItem, ItemChange
+from .ranking import refresh_rank_scores
+from .signals import items_changed
+from .sources import parse_item_time
+
+# (max age in hours, base refresh interval in seconds)
+AGE_TIERS = (
+    (1, 120),
+    (6, 300),
+    (24, 900),
+)
+OLD_STORY_INTERVAL = 3600
+
+
+def next_refresh_interval(age_hours, velocity=0.0, options=None):
+    """
+    Decide how long to wait before refreshing an item again.
+
+    Young stories start on short intervals that grow with age, and the interval
+    is divided by how fast the score and comment count are moving.
+
+    Args:
+        age_hours (float): The age of the item in hours.
+        velocity (float): Points plus comments gained per hour since the last refresh.
+        options (dict, optional): The refresh options. Defaults to the HACKERNEWS_REFRESH setting.
+
+    Returns:
+        timedelta: The delay until the next refresh, or None once the item is too old to track.
+    """
+    options = options or settings.HACKERNEWS_REFRESH
+    if age_hours >= options['max_age_hours']:
+        return None
+
+    interval = OLD_STORY_INTERVAL
+    for max_age, tier_interval in AGE_TIERS:
+        if age_hours < max_age:
+            interval = tier_interval
+            break
+
+    interval = interval / (1 + max(velocity, 0) / 10)
+    return timedelta(seconds=max(interval, options['min_interval_seconds']))
+
+
+def schedule_next_refresh(item, now, options=None):
+    """
+    Set next_refresh_at on an item from its age and velocity.
+
+    Args:
+        item (HackerNewsItem): The item to schedule.
+        now (datetime): The reference time.
+        options (dict, optional): The refresh options.
+    """
+    if item.posted_at is None:
+        item.next_refresh_at = None
+        return
+
+    age_hours = (now - item.posted_at).total_seconds() / 3600
+    interval = next_refresh_interval(age_hours, item.score_velocity, options=options)
+    item.next_refresh_at = now + interval if interval else None
+
+
+class RefreshScheduler:
+    """
+    Refresh stored stories by priority within a per-cycle request budget.
+
+    The indexed next_refresh_at column is the priority queue: each cycle pops
+    the items that are due soonest, refreshes them, and pushes them back with a
+    new due time based on their age and how fast they are changing. Items that
+    are dead, deleted or older than max_age_hours drop out of the queue.
+
+    """
+
+    def __init__(self, fetcher, budget=None):
+        self.options = settings.HACKERNEWS_REFRESH
+        self.budget = budget or self.options['budget']
+        self.fetcher = fetcher
+
+    def due_items(self, now):
+        """
+        Return the items whose refresh is due, most overdue first.
+
+        Args:
+            now (datetime): The reference time.
+
+        Returns:
+            list: Up to budget HackerNewsItem instances.
+        """
+        return list(
+            HackerNewsItem.objects.filter(next_refresh_at__lte=now, in_house=False)
+            .order_by('next_refresh_at')[:self.budget]
+        )
+
+    async def refresh_item(self, item, now):
+        """
+        Fetch the latest data for an item and reschedule it.
+
+        When the comment count moved, the comment tree is walked again so the
+        new comments are ingested; the ones already stored are not saved twice.
+
+        Args:
+            item (HackerNewsItem): The item to refresh.
+            now (datetime): The reference time.
+        """
+        data = await self.fetcher.fetch_item(item.item_id)
+
+        if is_gone(data):
+            await sync_to_async(self.remove_item)(item)
+            return
+
+        if item.posted_at is None:
+            # Stored before the column existed
+            item.posted_at = parse_item_time(data.get('time'))
+        score = data.get('score', 0) or 0
+        descendants = int(data.get('descendants', 0) or 0)
+        has_new_comments = descendants != item.descendants
+        changed = (score, descendants, data.get('title', item.title)) != (item.score, item.descendants, item.title)
+        elapsed_hours = (now - (item.last_refreshed_at or item.posted_at or now)).total_seconds() / 3600
+        if elapsed_hours > 0:
+            item.score_velocity = ((score - (item.score or 0)) + (descendants - (item.descendants or 0))) / elapsed_hours
+
+        item.score = score
+        item.descendants = descendants
+        item.title = data.get('title', item.title)
+        item.last_refreshed_at = now
+        schedule_next_refresh(item, now, self.options)
+        if changed:
+            item.version += 1
+
+        await sync_to_async(item.save)(update_fields=[
+            'score', 'descendants', 'title', 'posted_at', 'score_velocity', 'last_refreshed_at', 'next_refresh_at',
+            'version',
+        ])
+        if changed:
+            await sync_to_async(record_changes)([story_change(item, ItemChange.UPDATED)])
+        if has_new_comments and data.get('kids'):
+            await self.fetcher.fetch_and_save_kids_items(kid_ids=data['kids'], item_id=item, parent_comment_id=None)
+
+    def remove_item(self, item):
+        """
+        Delete a story that is dead or deleted upstream, with its comment tree.
+
+        Its deletion and its comments' are recorded in the change feed in the
+        same transaction, so consumers never hear of a story that is still served.
+
+        Args:
+            item (HackerNewsItem): The story to remove.
+        """
+        with transaction.atomic():
+            comments = list(HackerNewsComment.objects.filter(news_item_id=item.item_id).values_list('item_id', 'by'))
+            item.delete()
+            refresh_authors([item.by] + [by for _, by in comments])
+            item.version += 1
+            record_changes(
+                [story_change(item, ItemChange.DELETED)]
+                + comment_changes([comment_id for comment_id, _ in comments], ItemChange.DELETED)
+            )
+
+    async def run_cycle(self):
+        """
+        Refresh every due item within the budget, then recompute the rankings.
+
+        Returns:
+            int: The number of items refreshed.
+        """
+        now = timezone.now()
+        with use_primary():
+            items = await sync_to_async(self.due_items)(now)
+            if not items:
+                return 0
+
+            await self.fetcher.initialize()
+            try:
+                # Items that fail stay due and are retried on the next cycle
+                await asyncio.gather(*(self.refresh_item(item, now) for item in items), return_exceptions=True)
+            finally:
+                await self.fetcher.close()
+
+            await sync_to_async(refresh_rank_scores)(now)
+            await sync_to_async(refresh_authors)(self.fetcher.authors)
+        await sync_to_async(items_changed.send)(sender=self.__class__)
+        return len(items)
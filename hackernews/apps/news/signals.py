@@ -0,0 +1,5 @@
+from django.dispatch import Signal
+
+# Sent after stored items were created, updated or deleted in bulk
+# (a crawl, a refresh cycle or an API write).
+items_changed = Signal()
@@ -0,0 +1,276 @@
+import mmap
+import random
+import time
+from datetime import datetime, timezone
+
+import ujson
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from .client import HACKERNEWS_API_URL, client
+
+NEW_STORIES_KEY = b'newstories'
+
+
+def parse_item_time(timestamp):
+    """
+    Convert the Unix timestamp of a Hacker News item to an aware datetime.
+
+    Args:
+        timestamp (int): The item's `time` field.
+
+    Returns:
+        datetime: The aware datetime, or None when the item has no time.
+    """
+    if timestamp is None:
+        return None
+    return datetime.fromtimestamp(timestamp, tz=timezone.utc)
+
+
+class ItemSource:
+    """
+    Interface of the backends HackerNewsFetcher reads items from.
+
+    """
+
+    async def open(self):
+        """
+        Acquire whatever the source needs before the first fetch.
+
+        """
+
+    async def close(self):
+        """
+        Release what open() acquired.
+
+        """
+
+    async def fetch_new_story_ids(self):
+        """
+        Retrieve the ids of the newest stories, newest first.
+
+        Returns:
+            list: The story ids.
+        """
+        raise NotImplementedError
+
+    async def fetch_item(self, item_id):
+        """
+        Retrieve a single item.
+
+        Args:
+            item_id (int): The Hacker News item id.
+
+        Returns:
+            dict: The item JSON, or None when the item does not exist.
+        """
+        raise NotImplementedError
+
+
+class HttpItemSource(ItemSource):
+    """
+    Live Hacker News Firebase API, over the shared pooled session.
+
+    Instances in one process that read the same API share in-flight requests
+    through the coalescer, see inflight.py.
+    """
+
+    def __init__(self, base_url=HACKERNEWS_API_URL):
+        self.base_url = base_url
+        self.coalesce_key = base_url
+        self.session = None
+
+    async def open(self):
+        self.session = client.get_session()
+
+    async def close(self):
+        # The pooled session outlives the crawl, it is closed at process exit
+        self.session = None
+
+    async def fetch_new_story_ids(self):
+        return await self._get_json(f'{self.base_url}/newstories.json')
+
+    async def fetch_item(self, item_id):
+        return await self._get_json(f'{self.base_url}/item/{item_id}.json')
+
+    async def _get_json(self, url):
+        async with self.session.get(url) as response:
+            response.raise_for_status()
+            return await response.json(loads=ujson.loads)
+
+
+class ReplayItemSource(ItemSource):
+    """
+    Serves items recorded by RecordingItemSource from a memory-mapped file.
+
+    The file has one record per line, '<id>\\t<item json>', plus a
+    'newstories\\t<id list>' line. Only the ids are read when the file is
+    opened; an item's JSON is parsed when it is requested.
+
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+        self._map = None
+        self._index = {}
+
+    async def open(self):
+        if self._map is not None:
+            return
+        self._file = open(self.path, 'rb')
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        position = 0
+        size = len(self._map)
+        while position < size:
+            end = self._map.find(b'\n', position)
+            if end == -1:
+                end = size
+            tab = self._map.find(b'\t', position, end)
+            if tab != -1:
+                key = self._map[position:tab]
+                self._index[key if key == NEW_STORIES_KEY else int(key)] = (tab + 1, end)
+            position = end + 1
+
+    async def close(self):
+        if self._map is not None:
+            self._map.close()
+            self._file.close()
+        self._map = None
+        self._file = None
+        self._index = {}
+
+    async def fetch_new_story_ids(self):
+        return self._load(NEW_STORIES_KEY) or []
+
+    async def fetch_item(self, item_id):
+        return self._load(item_id)
+
+    def _load(self, key):
+        span = self._index.get(key)
+        if span is None:
+            return None
+        start, end = span
+        return ujson.loads(self._map[start:end])
+
+
+class RecordingItemSource(ItemSource):
+    """
+    Wraps another source and records everything it serves in the replay format.
+
+    """
+
+    def __init__(self, source, path):
+        self.source = source
+        self.path = path
+        self._file = None
+        self._recorded = set()
+
+    async def open(self):
+        await self.source.open()
+        self._file = open(self.path, 'wb')
+
+    async def close(self):
+        await self.source.close()
+        if self._file is not None:
+            self._file.close()
+        self._file = None
+
+    async def fetch_new_story_ids(self):
+        story_ids = await self.source.fetch_new_story_ids()
+        self._write(NEW_STORIES_KEY, story_ids)
+        return story_ids
+
+    async def fetch_item(self, item_id):
+        item = await self.source.fetch_item(item_id)
+        if item is not None and item_id not in self._recorded:
+            self._recorded.add(item_id)
+            self._write(str(item_id).encode(), item)
+        return item
+
+    def _write(self, key, value):
+        self._file.write(key + b'\t' + ujson.dumps(value).encode() + b'\n')
+
+
+class SyntheticItemSource(ItemSource):
+    """
+    Generates a deterministic set of stories and comment trees in memory.
+
+    The same seed always yields the same stories and comment trees, with
+    times relative to now, which makes ingest benchmarks repeatable without
+    any recorded data.
+
+    """
+
+    def __init__(self, stories=100, comments_per_item=3, depth=3, seed=0):
+        rng = random.Random(seed)
+        now = int(time.time())
+        self.items = {}
+        self.story_ids = []
+
+        next_id = 1
+
+        def add_comments(parent_id, level, posted):
+            nonlocal next_id
+            if level >= depth:
+                return []
+            kids = []
+            for _ in range(rng.randint(0, comments_per_item * 2)):
+                comment_id = next_id
+                next_id += 1
+                comment_time = posted + rng.randint(1, 3600)
+                self.items[comment_id] = {
+                    'id': comment_id,
+                    'type': 'comment',
+                    'by': f'user{rng.randint(1, 500)}',
+                    'parent': parent_id,
+                    'text': f'Synthetic comment {comment_id}',
+                    'time': comment_time,
+                }
+                grandkids = add_comments(comment_id, level + 1, comment_time)
+                if grandkids:
+                    self.items[comment_id]['kids'] = grandkids
+                kids.append(comment_id)
+            return kids
+
+        for number in range(stories):
+            story_id = next_id
+            next_id += 1
+            posted = now - rng.randint(0, 3 * 24 * 3600)
+            story = {
+                'id': story_id,
+                'type': 'story',
+                'by': f'user{rng.randint(1, 500)}',
+                'title': f'Synthetic story {number}',
+                'url': f'https://example.com/{story_id}',
+                'score': rng.randint(1, 500),
+                'time': posted,
+            }
+            self.items[story_id] = story
+            stored = len(self.items)
+            kids = add_comments(story_id, 0, posted)
+            story['descendants'] = len(self.items) - stored
+            if kids:
+                story['kids'] = kids
+            self.story_ids.append(story_id)
+
+        self.story_ids.reverse()
+
+    async def fetch_new_story_ids(self):
+        return list(self.story_ids)
+
+    async def fetch_item(self, item_id):
+        return self.items.get(item_id)
+
+
+def get_item_source():
+    """
+    Build the item source configured in HACKERNEWS_ITEM_SOURCE.
+
+    Returns:
+        ItemSource: The configured source, live HTTP by default.
+    """
+    config = settings.HACKERNEWS_ITEM_SOURCE
+    source_class = import_string(config['BACKEND'])
+    return source_class(**config.get('OPTIONS', {}))
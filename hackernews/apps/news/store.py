@@ -0,0 +1,195 @@
+import logging
+import threading
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.dispatch import receiver
+
+from .models import HackerNewsItem
+from .signals import items_changed
+
+logger = logging.getLogger('hackernews.store')
+
+VERSION_CACHE_KEY = 'hackernews:items:version'
+
+STORED_FIELDS = ('id', 'item_id', 'title', 'by', 'url', 'score', 'descendants', 'item_type', 'stored_comment_count')
+
+
+class StoredItem:
+    """
+    Lightweight read-only row for the front page, in place of a model instance.
+
+    """
+    __slots__ = ('pk', 'item_id', 'title', 'by', 'url', 'score', 'descendants', 'item_type', 'stored_comment_count')
+
+    def __init__(self, pk, item_id, title, by, url, score, descendants, item_type, stored_comment_count):
+        self.pk = pk
+        self.item_id = item_id
+        self.title = title
+        self.by = by
+        self.url = url
+        self.score = score
+        self.descendants = descendants
+        self.item_type = item_type
+        self.stored_comment_count = stored_comment_count
+
+    def as_dict(self):
+        """
+        Return the row in the shape of the API's HackerNewsItemSchema.
+
+        """
+        return {
+            'by': self.by,
+            'descendants': self.descendants,
+            'item_id': self.item_id,
+            'score': self.score,
+            'title': self.title,
+            'url': self.url,
+            'item_type': self.item_type,
+        }
+
+
+class FrontPageStore:
+    """
+    Process-local snapshot of the newest and the hottest stored items.
+
+    The snapshot is rebuilt lazily when the items version kept in the default
+    cache changes. With the shared Redis cache configured in the settings,
+    readers in any process pick up a crawl run by a Django-Q worker within
+    check_interval seconds, without the ORM building a model instance per row.
+    While the cache is unreachable nothing is served from the snapshot, and
+    the callers read the database instead.
+
+    """
+    __slots__ = ('size', 'check_interval', '_newest', '_hottest', '_version', '_checked_at', '_lock')
+
+    def __init__(self, size, check_interval=1.0):
+        self.size = size
+        self.check_interval = check_interval
+        self._newest = ()
+        self._hottest = ()
+        self._version = None
+        self._checked_at = None
+        self._lock = threading.Lock()
+
+    def newest(self, limit):
+        """
+        Return up to limit items ordered by newest first.
+
+        Args:
+            limit (int): The number of items wanted.
+
+        Returns:
+            tuple: The StoredItem rows, or None when limit is beyond the snapshot.
+        """
+        return self._slice('_newest', limit)
+
+    def hottest(self, limit):
+        """
+        Return up to limit items ordered by rank_score.
+
+        Args:
+            limit (int): The number of items wanted.
+
+        Returns:
+            tuple: The StoredItem rows, or None when limit is beyond the snapshot.
+        """
+        return self._slice('_hottest', limit)
+
+    async def anewest(self, limit):
+        """
+        Async version of newest(), for views running on the event loop.
+
+        """
+        return await self._aslice('_newest', limit)
+
+    async def ahottest(self, limit):
+        """
+        Async version of hottest(), for views running on the event loop.
+
+        """
+        return await self._aslice('_hottest', limit)
+
+    def invalidate(self):
+        """
+        Check the shared version on the next read instead of waiting for check_interval.
+
+        """
+        self._checked_at = None
+
+    def _slice(self, attribute, limit):
+        if limit < 0 or limit > self.size:
+            return None
+        if self._should_check():
+            try:
+                version = cache.get(VERSION_CACHE_KEY, 0)
+            except Exception:
+                return self._cache_unavailable()
+            self._refresh(version)
+        return getattr(self, attribute)[:limit]
+
+    async def _aslice(self, attribute, limit):
+        if limit < 0 or limit > self.size:
+            return None
+        # Between checks the snapshot is served straight from memory, without leaving the event loop
+        if self._should_check():
+            try:
+                version = await cache.aget(VERSION_CACHE_KEY, 0)
+            except Exception:
+                return self._cache_unavailable()
+            if version != self._version:
+                await sync_to_async(self._refresh)(version)
+        return getattr(self, attribute)[:limit]
+
+    def _should_check(self):
+        now = time.monotonic()
+        if self._checked_at is not None and now - self._checked_at < self.check_interval:
+            return False
+        self._checked_at = now
+        return True
+
+    def _cache_unavailable(self):
+        logger.warning('Cannot read the items version from the cache, reading the front page from the database',
+                       exc_info=True)
+        # The snapshot may be stale by now; check again on the next read
+        self._checked_at = None
+        return None
+
+    def _refresh(self, version):
+        if version == self._version:
+            return
+        with self._lock:
+            if version == self._version:
+                return
+            newest = HackerNewsItem.objects.order_by('-id').values_list(*STORED_FIELDS)[:self.size]
+            hottest = HackerNewsItem.objects.order_by('-rank_score', '-id').values_list(*STORED_FIELDS)[:self.size]
+            self._newest = tuple(StoredItem(*row) for row in newest)
+            self._hottest = tuple(StoredItem(*row) for row in hottest)
+            self._version = version
+
+
+def bump_items_version():
+    """
+    Invalidate every process's FrontPageStore snapshot.
+
+    """
+    if not cache.add(VERSION_CACHE_KEY, 1, timeout=None):
+        try:
+            cache.incr(VERSION_CACHE_KEY)
+        except ValueError:
+            cache.set(VERSION_CACHE_KEY, 1, timeout=None)
+
+
+@receiver(items_changed)
+def invalidate_front_page(sender, **kwargs):
+    try:
+        bump_items_version()
+    except Exception:
+        # Readers fall back to the database while the cache is down, a crawl must not fail for it
+        logger.warning('Cannot bump the items version in the cache', exc_info=True)
+    front_page.invalidate()
+
+
+front_page = FrontPageStore(size=settings.HACKERNEWS_FRONT_PAGE_SIZE)
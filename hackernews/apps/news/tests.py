@@ -1,3 +1,543 @@
-from django.test import TestCase
+import asyncio
+import tempfile
+from datetime import timedelta
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from hackernews.testing import assert_max_queries, assert_query_budget
+
+from .aggregates import add_comments_to_aggregates, recompute_comment_aggregates
+from .archive import ARCHIVE_LOCK_KEY, archive_stories, load_archived_story
+from .authors import author_activity, decode_cursor, encode_cursor, refresh_authors
+from .inflight import ItemRequestCoalescer, coalescing_ratio
+from .jobs import CRAWL_LOCK_KEY, CrawlJobManager
+from .models import ArchivedStory, HackerNewsAuthor, HackerNewsComment, HackerNewsItem, ItemChange
+from .ranking import hot_scores, refresh_rank_scores
+from .refresh import RefreshScheduler, next_refresh_interval
+from .sources import ItemSource, RecordingItemSource, ReplayItemSource, SyntheticItemSource
+from .store import FrontPageStore, bump_items_version, front_page
+from .utils import HackerNewsFetcher
+
+LOCAL_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+def create_story(item_id, by='alice', score=10, hours_ago=1, **kwargs):
+    return HackerNewsItem.objects.create(
+        item_id=item_id,
+        title=f'Story {item_id}',
+        by=by,
+        url=f'https://example.com/{item_id}',
+        score=score,
+        descendants=kwargs.pop('descendants', 0),
+        item_type='story',
+        posted_at=timezone.now() - timedelta(hours=hours_ago),
+        **kwargs,
+    )
+
+
+def create_comments(story, count, by='bob', first_id=10000):
+    """
+    Create a thread of count comments under story, each replying to the previous one.
+
+    """
+    parent = None
+    comments = []
+    for offset in range(count):
+        parent = HackerNewsComment.objects.create(
+            item_id=first_id + offset,
+            by=by,
+            text=f'Comment {offset}',
+            news_item=story,
+            parent=parent,
+            depth=offset,
+            posted_at=story.posted_at + timedelta(minutes=offset + 1),
+        )
+        comments.append(parent)
+    return comments
+
+
+@override_settings(CACHES=LOCAL_CACHES)
+class QueryBudgetTests(TestCase):
+    """
+    Hold the read endpoints to a query budget that does not grow with the data.
+
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.stories = [create_story(item_id, by=f'user{item_id % 3}') for item_id in range(1, 31)]
+        create_comments(cls.stories[0], 25)
+        refresh_authors({story.by for story in cls.stories} | {'bob'})
+
+    def setUp(self):
+        # The front page snapshot is process-wide, make it reload this test's rows
+        bump_items_version()
+        front_page.invalidate()
+
+    def test_news_list(self):
+        response = assert_query_budget(self.client, reverse('news-list'), 3)
+        self.assertEqual(response.status_code, 200)
+
+    def test_news_detail(self):
+        response = assert_query_budget(self.client, reverse('news-detail', args=[self.stories[0].pk]), 2)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Comment 1')
+
+    def test_api_items(self):
+        for sort in ('new', 'hot'):
+            response = assert_query_budget(self.client, f'/api/v1/hackernews/items?sort={sort}', 2)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(response.json()), 30)
+
+    def test_api_item_comments(self):
+        response = assert_query_budget(self.client, f'/api/v1/hackernews/items/{self.stories[0].item_id}/comments', 2)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()), 25)
+
+    def test_api_user(self):
+        response = assert_query_budget(self.client, '/api/v1/hackernews/users/bob', 3)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['comment_count'], 25)
+
+    def test_budget_is_enforced(self):
+        with self.assertRaises(AssertionError):
+            with assert_max_queries(0):
+                list(HackerNewsItem.objects.all())
+
+
+@override_settings(CACHES=LOCAL_CACHES)
+class FrontPageStoreTests(TestCase):
+
+    def setUp(self):
+        self.stories = [create_story(item_id) for item_id in range(1, 6)]
+        bump_items_version()
+        front_page.invalidate()
+
+    def test_snapshot_is_rebuilt_when_the_version_changes(self):
+        store = FrontPageStore(size=3, check_interval=0)
+        self.assertEqual([item.item_id for item in store.newest(3)], [5, 4, 3])
+
+        create_story(6)
+        self.assertEqual([item.item_id for item in store.newest(3)], [5, 4, 3])
+        bump_items_version()
+        self.assertEqual([item.item_id for item in store.newest(3)], [6, 5, 4])
+
+    def test_limits_beyond_the_snapshot_fall_back_to_the_database(self):
+        store = FrontPageStore(size=3)
+        self.assertIsNone(store.newest(4))
+        self.assertIsNone(store.hottest(-1))
+
+        response = self.client.get('/api/v1/hackernews/items', {'limit': front_page.size + 1})
+        self.assertEqual([item['item_id'] for item in response.json()], [5, 4, 3, 2, 1])
+
+    def test_list_pages_are_served_from_the_snapshot(self):
+        self.client.get('/api/v1/hackernews/items')
+        # Not announced through items_changed, so only the database sees it
+        HackerNewsItem.objects.filter(item_id=5).update(title='Renamed')
+
+        self.assertEqual(self.client.get('/api/v1/hackernews/items').json()[0]['title'], 'Story 5')
+        self.assertContains(self.client.get(reverse('news-list')), 'Story 5')
+        self.assertNotContains(self.client.get(reverse('news-list')), 'Renamed')
+
+    @override_settings(CACHES={'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': 'redis://127.0.0.1:1/0',
+    }})
+    def test_unreachable_cache_falls_back_to_the_database(self):
+        with self.assertLogs('hackernews.store', 'WARNING'):
+            self.assertIsNone(FrontPageStore(size=3).newest(3))
+            response = self.client.get(reverse('news-list'))
+        self.assertContains(response, 'Story 5')
+
+
+class HotScoresTests(SimpleTestCase):
+
+    def test_matches_the_gravity_formula(self):
+        ranks = hot_scores(np.array([101.0]), np.array([0.0]), np.array([2.0]), gravity=1.8, age_offset_hours=2)
+        self.assertAlmostEqual(ranks[0], 100 / 4 ** 1.8)
+
+    def test_older_stories_rank_lower(self):
+        ranks = hot_scores(np.array([50.0, 50.0]), np.array([0.0, 0.0]), np.array([1.0, 10.0]))
+        self.assertGreater(ranks[0], ranks[1])
+
+    def test_comments_count_only_with_a_weight(self):
+        scores, comments, ages = np.array([10.0]), np.array([20.0]), np.array([1.0])
+        self.assertLess(hot_scores(scores, comments, ages)[0], hot_scores(scores, comments, ages, comment_weight=0.5)[0])
+
+    def test_scores_never_go_negative(self):
+        ranks = hot_scores(np.array([0.0]), np.array([0.0]), np.array([-5.0]))
+        self.assertEqual(ranks[0], 0)
+
+
+class RefreshRankScoresTests(TestCase):
+
+    def test_ranks_the_window_and_resets_older_stories(self):
+        now = timezone.now()
+        fresh = create_story(1, score=100, hours_ago=1)
+        stale = create_story(2, score=500, hours_ago=2, rank_score=3.0)
+        old = create_story(3, score=900, hours_ago=settings.HACKERNEWS_RANKING['max_age_hours'] + 1, rank_score=7.0)
+
+        self.assertEqual(refresh_rank_scores(now), 2)
+
+        fresh.refresh_from_db()
+        stale.refresh_from_db()
+        old.refresh_from_db()
+        self.assertGreater(fresh.rank_score, 0)
+        self.assertGreater(stale.rank_score, fresh.rank_score)
+        self.assertEqual(old.rank_score, 0)
+
+
+class NextRefreshIntervalTests(SimpleTestCase):
+    options = {'budget': 100, 'min_interval_seconds': 60, 'max_age_hours': 72}
+
+    def test_interval_grows_with_age(self):
+        young = next_refresh_interval(0.5, options=self.options)
+        older = next_refresh_interval(12, options=self.options)
+        oldest = next_refresh_interval(48, options=self.options)
+        self.assertLess(young, older)
+        self.assertLess(older, oldest)
+
+    def test_fast_moving_items_are_refreshed_sooner(self):
+        self.assertLess(next_refresh_interval(12, velocity=50, options=self.options), next_refresh_interval(12, options=self.options))
+
+    def test_interval_has_a_floor(self):
+        self.assertEqual(next_refresh_interval(0.5, velocity=10000, options=self.options), timedelta(seconds=60))
+
+    def test_items_past_max_age_are_dropped(self):
+        self.assertIsNone(next_refresh_interval(72, options=self.options))
+
+
+@override_settings(CACHES=LOCAL_CACHES)
+class RefreshSchedulerTests(TestCase):
+
+    def test_new_comments_on_stored_stories_are_ingested(self):
+        source = SyntheticItemSource(stories=1, comments_per_item=2, depth=2, seed=4)
+        async_to_sync(HackerNewsFetcher(source).run)()
+        story_id = source.story_ids[0]
+        stored = HackerNewsComment.objects.filter(news_item_id=story_id).count()
+
+        # A reply shows up upstream while the story is not due for the crawl
+        story = source.items[story_id]
+        source.items[90001] = {
+            'id': 90001, 'type': 'comment', 'by': 'carol', 'parent': story_id,
+            'text': 'Late reply', 'time': story['time'] + 60,
+        }
+        story['kids'] = story.get('kids', []) + [90001]
+        story['descendants'] += 1
+        HackerNewsItem.objects.filter(item_id=story_id).update(next_refresh_at=timezone.now() - timedelta(minutes=1))
+
+        self.assertEqual(async_to_sync(RefreshScheduler(HackerNewsFetcher(source)).run_cycle)(), 1)
+        self.assertEqual(HackerNewsComment.objects.filter(news_item_id=story_id).count(), stored + 1)
+        self.assertEqual(HackerNewsItem.objects.get(item_id=story_id).stored_comment_count, stored + 1)
+        self.assertTrue(ItemChange.objects.filter(item_id=90001, action=ItemChange.CREATED).exists())
+
+    def test_stories_stored_without_posted_at_are_backfilled(self):
+        source = SyntheticItemSource(stories=1, comments_per_item=0, seed=5)
+        story_id = source.story_ids[0]
+        create_story(story_id)
+        HackerNewsItem.objects.filter(item_id=story_id).update(posted_at=None, next_refresh_at=None)
+
+        # The crawl does not skip it, and a refresh fills the posting time in
+        fetcher = HackerNewsFetcher(source)
+        self.assertEqual(fetcher.get_not_due_story_ids([story_id], timezone.now()), set())
+        HackerNewsItem.objects.filter(item_id=story_id).update(next_refresh_at=timezone.now())
+        async_to_sync(RefreshScheduler(fetcher).run_cycle)()
+        self.assertEqual(
+            HackerNewsItem.objects.get(item_id=story_id).posted_at.timestamp(), source.items[story_id]['time'],
+        )
+
+
+class CommentAggregatesTests(TestCase):
+
+    def test_batches_add_up(self):
+        story = create_story(1)
+        first = create_comments(story, 2, first_id=100)
+        second = create_comments(story, 3, first_id=200)
+        add_comments_to_aggregates(story.item_id, first)
+        add_comments_to_aggregates(story.item_id, second)
+
+        story.refresh_from_db()
+        self.assertEqual(story.stored_comment_count, 5)
+        self.assertEqual(story.max_depth, 2)
+        self.assertEqual(story.last_comment_at, max(comment.posted_at for comment in first + second))
+
+    def test_recompute_matches_the_comments_table(self):
+        story = create_story(1, stored_comment_count=99, max_depth=9)
+        empty = create_story(2, stored_comment_count=4)
+        comments = create_comments(story, 4)
+
+        self.assertEqual(recompute_comment_aggregates(), 1)
+
+        story.refresh_from_db()
+        empty.refresh_from_db()
+        self.assertEqual((story.stored_comment_count, story.max_depth), (4, 3))
+        self.assertEqual(story.last_comment_at, comments[-1].posted_at)
+        self.assertEqual((empty.stored_comment_count, empty.last_comment_at), (0, None))
+
+
+@override_settings(CACHES=LOCAL_CACHES)
+@override_settings(CACHES=LOCAL_CACHES)
+class ArchiveTests(TestCase):
+
+    def setUp(self):
+        self.root = tempfile.TemporaryDirectory()
+        self.addCleanup(self.root.cleanup)
+        archive_settings = override_settings(HACKERNEWS_ARCHIVE={**settings.HACKERNEWS_ARCHIVE, 'root': self.root.name})
+        archive_settings.enable()
+        self.addCleanup(archive_settings.disable)
+
+    def test_round_trip(self):
+        old = create_story(1, hours_ago=24 * 40, score=42)
+        create_comments(old, 3)
+        recent = create_story(2, hours_ago=1)
+
+        self.assertEqual(archive_stories(retention_days=30), 1)
+
+        self.assertFalse(HackerNewsItem.objects.filter(pk=old.pk).exists())
+        self.assertFalse(HackerNewsComment.objects.filter(news_item_id=old.item_id).exists())
+        self.assertTrue(HackerNewsItem.objects.filter(pk=recent.pk).exists())
+        self.assertTrue(any(Path(self.root.name).rglob('*.json.gz')))
+        self.assertEqual(ArchivedStory.objects.get().story_pk, old.pk)
+        self.assertEqual(ItemChange.objects.filter(action=ItemChange.DELETED).count(), 4)
+
+        for lookup in ({'item_id': old.item_id}, {'story_pk': old.pk}):
+            story, comments = load_archived_story(**lookup)
+            self.assertEqual((story.item_id, story.title, story.score), (1, 'Story 1', 42))
+            self.assertEqual(story.posted_at, old.posted_at)
+            self.assertEqual([comment.text for comment in comments], ['Comment 0', 'Comment 1', 'Comment 2'])
+            self.assertIs(comments[1].parent, comments[0])
+
+    def test_unknown_story(self):
+        self.assertIsNone(load_archived_story(item_id=404))
+
+    def test_runs_do_not_overlap(self):
+        create_story(1, hours_ago=24 * 40)
+        cache.add(ARCHIVE_LOCK_KEY, 'other run')
+        self.assertIsNone(archive_stories(retention_days=30))
+        self.assertTrue(HackerNewsItem.objects.filter(item_id=1).exists())
+
+        cache.delete(ARCHIVE_LOCK_KEY)
+        self.assertEqual(archive_stories(retention_days=30), 1)
+        self.assertIsNone(cache.get(ARCHIVE_LOCK_KEY))
+
+
+class ItemSourceTests(SimpleTestCase):
+
+    def test_replay_serves_what_was_recorded(self):
+        synthetic = SyntheticItemSource(stories=5, seed=1)
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / 'items.tsv'
+
+            async def record():
+                recorder = RecordingItemSource(synthetic, path)
+                await recorder.open()
+                try:
+                    story_ids = await recorder.fetch_new_story_ids()
+                    for item_id in story_ids + [story_ids[0]]:
+                        await recorder.fetch_item(item_id)
+                    await recorder.fetch_item(999999)
+                finally:
+                    await recorder.close()
+                return story_ids
+
+            async def replay(item_ids):
+                source = ReplayItemSource(path)
+                await source.open()
+                try:
+                    return await source.fetch_new_story_ids(), [await source.fetch_item(item_id) for item_id in item_ids]
+                finally:
+                    await source.close()
+
+            story_ids = asyncio.run(record())
+            # Items are recorded once, and missing ones not at all
+            self.assertEqual(len(path.read_bytes().splitlines()), len(story_ids) + 1)
+
+            replayed_ids, items = asyncio.run(replay(story_ids + [999999]))
+            self.assertEqual(replayed_ids, story_ids)
+            self.assertEqual(items[:-1], [synthetic.items[item_id] for item_id in story_ids])
+            self.assertIsNone(items[-1])
+
+    def test_synthetic_data_is_deterministic(self):
+        first, second = SyntheticItemSource(stories=3, seed=7), SyntheticItemSource(stories=3, seed=7)
+        self.assertEqual(first.story_ids, second.story_ids)
+        self.assertEqual(len(first.items), len(second.items))
+
+
+@override_settings(CACHES=LOCAL_CACHES)
+class HackerNewsFetcherTests(TestCase):
+
+    def test_synthetic_crawls(self):
+        source = SyntheticItemSource(stories=5, comments_per_item=2, depth=3, seed=2)
+        comments = {item_id: item for item_id, item in source.items.items() if item['type'] == 'comment'}
+
+        fetcher = HackerNewsFetcher(source)
+        async_to_sync(fetcher.run)()
+        self.assertEqual(fetcher.progress['stories_done'], 5)
+        self.assertEqual(set(HackerNewsItem.objects.values_list('item_id', flat=True)), set(source.story_ids))
+        self.assertEqual(set(HackerNewsComment.objects.values_list('item_id', flat=True)), set(comments))
+        for story in HackerNewsItem.objects.all():
+            self.assertEqual(story.stored_comment_count, source.items[story.item_id]['descendants'])
+        self.assertEqual(
+            {author.name: author.story_count + author.comment_count for author in HackerNewsAuthor.objects.all()},
+            {
+                name: sum(1 for item in source.items.values() if item['by'] == name)
+                for name in {item['by'] for item in source.items.values()}
+            },
+        )
+        self.assertEqual(ItemChange.objects.filter(action=ItemChange.CREATED).count(), len(source.items))
+
+        # Nothing is due yet, so a second crawl leaves everything as it was
+        fetcher = HackerNewsFetcher(source)
+        async_to_sync(fetcher.run)()
+        self.assertEqual(fetcher.progress['stories_skipped'], 5)
+        self.assertEqual(fetcher.progress['item_requests'], 0)
+        self.assertEqual(HackerNewsComment.objects.count(), len(comments))
+        self.assertEqual(ItemChange.objects.count(), len(source.items))
+
+
+class AuthorActivityTests(TestCase):
+
+    def test_pages_follow_the_cursor_without_gaps(self):
+        story = create_story(1, by='carol', hours_ago=10)
+        create_comments(create_story(2, by='dave', hours_ago=20), 5, by='carol')
+
+        seen, cursor = [], None
+        while True:
+            activity, cursor = author_activity('carol', cursor=cursor, limit=2)
+            seen.extend(entry['item_id'] for entry in activity)
+            if cursor is None:
+                break
+
+        self.assertEqual(len(seen), 6)
+        self.assertEqual(len(set(seen)), 6)
+        self.assertEqual(seen[0], story.item_id)
+
+    def test_cursor_round_trip(self):
+        posted_at = timezone.now().replace(microsecond=0)
+        self.assertEqual(decode_cursor(encode_cursor(posted_at, 12)), (posted_at, 12))
+        self.assertIsNone(decode_cursor('not a cursor'))
+
+
+class CountingSource(ItemSource):
+    coalesce_key = 'counting'
+
+    def __init__(self, gone=()):
+        self.calls = 0
+        self.gone = set(gone)
+
+    async def fetch_item(self, item_id):
+        self.calls += 1
+        await asyncio.sleep(0.01)
+        if item_id in self.gone:
+            return {'id': item_id, 'dead': True}
+        return {'id': item_id}
+
+
+class ItemRequestCoalescerTests(SimpleTestCase):
+
+    def test_concurrent_requests_share_one_call(self):
+        coalescer, counters = ItemRequestCoalescer(), {}
+        first, second = CountingSource(), CountingSource()
+
+        async def fetch():
+            return await asyncio.gather(*(coalescer.fetch(source, 1, counters) for source in (first, second, first)))
+
+        self.assertEqual(asyncio.run(fetch()), [{'id': 1}] * 3)
+        self.assertEqual(first.calls + second.calls, 1)
+        self.assertEqual(counters, {'item_requests': 3, 'upstream_fetches': 1, 'coalesced_requests': 2})
+        self.assertEqual(coalescer.stats['coalesced_requests'], 2)
+        self.assertAlmostEqual(coalescing_ratio(counters), 2 / 3)
+
+    def test_gone_items_are_cached_for_the_ttl(self):
+        coalescer, counters = ItemRequestCoalescer(), {}
+        source = CountingSource(gone={2})
+
+        async def fetch_twice(item_id):
+            await coalescer.fetch(source, item_id, counters)
+            return await coalescer.fetch(source, item_id, counters)
+
+        self.assertEqual(asyncio.run(fetch_twice(2)), {'id': 2, 'dead': True})
+        self.assertEqual(source.calls, 1)
+        self.assertEqual(counters['negative_cache_hits'], 1)
+
+        # Live items are always fetched again
+        asyncio.run(fetch_twice(3))
+        self.assertEqual(source.calls, 3)
+
+        with override_settings(HACKERNEWS_HTTP={**settings.HACKERNEWS_HTTP, 'negative_cache_ttl': 0}):
+            coalescer.clear()
+            asyncio.run(fetch_twice(2))
+        self.assertEqual(source.calls, 5)
+
+
+async def quick_crawl(fetcher):
+    await asyncio.sleep(0.01)
+
+
+@override_settings(CACHES=LOCAL_CACHES)
+class CrawlJobManagerTests(SimpleTestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def run_job(self, fetcher_run, before=None):
+        """
+        Enqueue twice, wait for the crawl to end and return both (job, created) pairs.
+
+        """
+        async def crawl():
+            manager = CrawlJobManager()
+            first = manager.enqueue()
+            second = manager.enqueue()
+            if before is not None:
+                await before(first[0])
+            try:
+                await first[0].task
+            except asyncio.CancelledError:
+                pass
+            return first, second
+
+        with mock.patch.object(HackerNewsFetcher, 'run', fetcher_run):
+            return asyncio.run(crawl())
+
+    def test_enqueue_returns_the_active_job(self):
+        (job, created), (again, created_again) = self.run_job(quick_crawl)
+        self.assertTrue(created)
+        self.assertFalse(created_again)
+        self.assertIs(again, job)
+        self.assertEqual(job.status, 'completed')
+        self.assertIsNone(cache.get(CRAWL_LOCK_KEY))
+
+    def test_skipped_while_another_process_crawls(self):
+        cache.add(CRAWL_LOCK_KEY, 'scheduled')
+        (job, _), _ = self.run_job(quick_crawl)
+        self.assertEqual(job.status, 'skipped')
+        self.assertEqual(cache.get(CRAWL_LOCK_KEY), 'scheduled')
+
+    def test_failed_crawls_release_the_lock(self):
+        async def fail(fetcher):
+            raise RuntimeError('API unreachable')
+
+        (job, _), _ = self.run_job(fail)
+        self.assertEqual((job.status, job.error), ('failed', 'API unreachable'))
+        self.assertIsNone(cache.get(CRAWL_LOCK_KEY))
+
+    def test_cancelled_crawls_are_not_left_running(self):
+        async def hang(fetcher):
+            await asyncio.sleep(60)
+
+        async def cancel(job):
+            await asyncio.sleep(0.05)
+            job.task.cancel()
+
+        (job, _), _ = self.run_job(hang, before=cancel)
+        self.assertEqual((job.status, job.error), ('failed', 'Interrupted (CancelledError)'))
+        self.assertIsNotNone(job.finished_at)
+        self.assertIsNone(cache.get(CRAWL_LOCK_KEY))
@@ -1,12 +1,17 @@
 from django.urls import path
 
-from .views import FetchHackerNewsView, HackernewsDetails, HackernewsListView
+from .views import (ChangeFeedEventsView, FetchHackerNewsEventsView,
+                    FetchHackerNewsStatusView, FetchHackerNewsView,
+                    HackernewsDetails, HackernewsListView)
 
 urlpatterns = [
     path('list/', HackernewsListView.as_view(), name='news-list'),
     path('list-<str:item_type>/', HackernewsListView.as_view(), name='news-list'),
     path('news-detail/<int:pk>/', HackernewsDetails.as_view(), name='news-detail'),
      path('fetch/', FetchHackerNewsView.as_view(), name='fetch_hacker_news'),
+     path('fetch/<str:job_id>/', FetchHackerNewsStatusView.as_view(), name='fetch_hacker_news_status'),
+     path('fetch/<str:job_id>/events/', FetchHackerNewsEventsView.as_view(), name='fetch_hacker_news_events'),
+     path('changes/events/', ChangeFeedEventsView.as_view(), name='change_feed_events'),
     
 
 ]
@@ -1,12 +1,21 @@
 import asyncio
 
-import aiohttp
-import ujson
 from asgiref.sync import sync_to_async
 from django.core.exceptions import ObjectDoesNotExist
-from django.db import IntegrityError
+from django.db import IntegrityError, transaction
+from django.utils import timezone as django_timezone
 
-from .models import HackerNewsComment, HackerNewsItem
+from hackernews.db import use_primary
+
+from .aggregates import add_comments_to_aggregates
+from .authors import refresh_authors
+from .changes import comment_changes, record_changes, story_change
+from .inflight import COUNTERS, inflight, is_gone
+from .models import HackerNewsComment, HackerNewsItem, ItemChange
+from .ranking import refresh_rank_scores
+from .refresh import schedule_next_refresh
+from .signals import items_changed
+from .sources import get_item_source, parse_item_time
 
 
 class HackerNewsFetcher:
@@ -15,18 +24,30 @@ class HackerNewsFetcher:
 
     """
 
-    def __init__(self):
-        self.session = None
+    def __init__(self, source=None):
+        self.source = source or get_item_source()
+        self.progress = {
+            'stories_total': 0,
+            'stories_skipped': 0,
+            'stories_done': 0,
+            'comments_saved': 0,
+            **dict.fromkeys(COUNTERS, 0),
+        }
+        self.authors = set()
 
     async def initialize(self):
-        self.session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=None))
+        """
+        Open the item source, e.g. attach the pooled HTTP session.
+
+        """
+        await self.source.open()
 
     async def close(self):
         """
-        Close the aiohttp ClientSession.
+        Close the item source.
 
         """
-        await self.session.close()
+        await self.source.close()
 
     async def get_latest_news_id(self):
         """
@@ -35,112 +56,230 @@ class HackerNewsFetcher:
         Returns:
             list: The list of latest Hacker News item IDs.
         """
-        new_hackernews_url = 'https://hacker-news.firebaseio.com/v0/newstories.json'
-        async with self.session.get(new_hackernews_url) as response:
-            response.raise_for_status()
-            news_ids = await response.json(loads=ujson.loads)
-            latest_news_ids = news_ids[:100]
+        news_ids = await self.source.fetch_new_story_ids()
+        latest_news_ids = news_ids[:100]
         return latest_news_ids
 
-    async def fetch_news_item(self, url):
+    async def fetch_news_item(self, news_id):
         """
         Fetch and save a Hacker News item.
 
         Args:
-            url (str): The URL to fetch the Hacker News item.
+            news_id (int): The Hacker News id of the item.
 
         """
-        async with self.session.get(url) as response:
-            response.raise_for_status()
-            news_item = await response.json(loads=ujson.loads)
-
+        news_item = await self.fetch_item(news_id)
+        # Dead and deleted stories are not ingested, RefreshScheduler removes stored ones
+        if news_item and not is_gone(news_item):
             hacker_news_item = HackerNewsItem(
                 item_id=news_item.get('id', ''),
                 title=news_item.get('title'),
                 by=news_item.get('by'),
                 url=news_item.get('url', ''),
                 descendants=int(news_item.get('descendants', 0) or 0),
-                score=news_item.get('score', ''),
-                item_type=news_item.get('type', '')
+                score=news_item.get('score', 0),
+                item_type=news_item.get('type', ''),
+                posted_at=parse_item_time(news_item.get('time'))
             )
+            self.authors.add(hacker_news_item.by)
 
+            now = django_timezone.now()
             try:
-                await sync_to_async(HackerNewsItem.objects.get)(item_id=hacker_news_item.item_id)
+                existing_item = await sync_to_async(HackerNewsItem.objects.get)(item_id=hacker_news_item.item_id)
             except ObjectDoesNotExist:
-                await self.save_model(hacker_news_item)
-
-
-            if 'kids' in news_item:
+                hacker_news_item.last_refreshed_at = now
+                schedule_next_refresh(hacker_news_item, now)
+                await sync_to_async(self.save_story)(hacker_news_item, ItemChange.CREATED)
+            else:
+                changed = (
+                    (existing_item.score, existing_item.descendants, existing_item.title)
+                    != (hacker_news_item.score, hacker_news_item.descendants, hacker_news_item.title)
+                )
+                # Keep the ranking inputs of stories we already have up to date
+                existing_item.score = hacker_news_item.score
+                existing_item.descendants = hacker_news_item.descendants
+                existing_item.title = hacker_news_item.title
+                existing_item.posted_at = hacker_news_item.posted_at
+                existing_item.last_refreshed_at = now
+                schedule_next_refresh(existing_item, now)
+                if changed:
+                    existing_item.version += 1
+                await sync_to_async(self.save_story)(
+                    existing_item,
+                    ItemChange.UPDATED if changed else None,
+                    update_fields=[
+                        'score', 'descendants', 'title', 'posted_at', 'last_refreshed_at', 'next_refresh_at', 'version',
+                    ],
+                )
+                hacker_news_item = existing_item
+
+
+            if 'kids' in news_item and hacker_news_item.pk:
                 kid_ids = news_item.get('kids', [])
                 await self.fetch_and_save_kids_items(kid_ids=kid_ids, item_id=hacker_news_item, parent_comment_id=None)
 
+        self.progress['stories_done'] += 1
+
     async def fetch_news_items(self):
         """
         Fetch and save multiple Hacker News items.
 
+        Only stories that are not stored yet, or whose next_refresh_at is due,
+        are fetched; the others are left to RefreshScheduler, so stored stories
+        are not fetched and their comment trees walked again on every crawl.
+
         """
         latest_news_ids = await self.get_latest_news_id()
+        not_due = await sync_to_async(self.get_not_due_story_ids)(latest_news_ids, django_timezone.now())
+        news_ids = [news_id for news_id in latest_news_ids if news_id not in not_due]
+        self.progress['stories_total'] = len(news_ids)
+        self.progress['stories_skipped'] = len(latest_news_ids) - len(news_ids)
         tasks = [
             asyncio.ensure_future(
-                self.fetch_news_item(f'https://hacker-news.firebaseio.com/v0/item/{item_id}.json')
+                self.fetch_news_item(item_id)
             )
-            for item_id in latest_news_ids
+            for item_id in news_ids
         ]
         await asyncio.gather(*tasks)
 
-    async def fetch_kids_item(self, url):
+    def get_not_due_story_ids(self, news_ids, now):
         """
-        Fetch a Hacker News comment.
+        Find the stories of a batch that are stored and not due for a refresh.
+
+        Stories that dropped out of the refresh queue (no next_refresh_at) count
+        as not due, unless they were stored before posted_at was and were never
+        scheduled at all.
 
         Args:
-            url (str): The URL to fetch the Hacker News comment.
+            news_ids (list): The Hacker News story ids.
+            now (datetime): The reference time.
 
         Returns:
-            dict: The fetched Hacker News comment.
+            set: The ids to leave out of the crawl.
+        """
+        return set(
+            HackerNewsItem.objects.filter(item_id__in=news_ids, posted_at__isnull=False)
+            .exclude(next_refresh_at__lte=now)
+            .values_list('item_id', flat=True)
+        )
 
+    async def fetch_item(self, item_id):
         """
+        Fetch a single Hacker News item by id without saving it.
 
-        async with self.session.get(url) as response:
-            response.raise_for_status()
-            kids_item = await response.json(loads=ujson.loads)
-            return kids_item
-        
-    async def fetch_and_save_kids_items(self, kid_ids: list, item_id: HackerNewsItem = None, parent_comment_id:HackerNewsComment  = None):
+        Goes through the process-wide coalescer, so an item already being
+        fetched in this process is not requested twice.
+
+        Args:
+            item_id (int): The Hacker News item id.
+
+        Returns:
+            dict: The item JSON, or None for items the API no longer serves.
+        """
+        return await inflight.fetch(self.source, item_id, self.progress)
+
+    async def fetch_and_save_kids_items(self, kid_ids: list, item_id: HackerNewsItem = None, parent_comment_id:HackerNewsComment  = None, depth: int = 0):
         """
         Fetch and save the Hacker News comments (kid items).
 
+        Comments already stored are not saved again, and the new ones are
+        created in one batch and folded into the story's comment aggregates.
+
         Args:
             kid_ids (list): The list of Hacker News comment IDs.
             item_id (HackerNewsItem): The parent Hacker News item.
             parent_comment_id (HackerNewsComment): The parent comment ID.
+            depth (int): The depth of these comments in the thread, 0 for top-level ones.
 
         """
 
         tasks = [
             asyncio.ensure_future(
-                self.fetch_kids_item(f'https://hacker-news.firebaseio.com/v0/item/{kid_id}.json')
+                self.fetch_item(kid_id)
             )
             for kid_id in kid_ids
         ]
-        kids_items = await asyncio.gather(*tasks)
-        
+        kids_items = [kid_item for kid_item in await asyncio.gather(*tasks) if kid_item]
+
+        stored_comments = await sync_to_async(self.get_stored_comments)([kid_item.get('id') for kid_item in kids_items])
+
+        new_comments = []
+        comments = []
         for kid_item in kids_items:
-            kid_news_item = HackerNewsComment(
-                by=kid_item.get('by'),
-                item_id=kid_item.get('id'),
-                text=kid_item.get('text'),
-                parent=parent_comment_id if  parent_comment_id else None,
-                news_item=item_id
-            )
+            kid_news_item = stored_comments.get(kid_item.get('id'))
+            if kid_news_item is None:
+                kid_news_item = HackerNewsComment(
+                    by=kid_item.get('by'),
+                    item_id=kid_item.get('id'),
+                    text=kid_item.get('text'),
+                    parent=parent_comment_id if  parent_comment_id else None,
+                    news_item=item_id,
+                    depth=depth,
+                    posted_at=parse_item_time(kid_item.get('time'))
+                )
+                new_comments.append(kid_news_item)
+                self.authors.add(kid_news_item.by)
+            comments.append((kid_item, kid_news_item))
+
+        if new_comments:
+            await sync_to_async(self.save_comments)(item_id, new_comments)
+            self.progress['comments_saved'] += len(new_comments)
+
+        for kid_item, kid_news_item in comments:
+            if 'kids' in kid_item and kid_news_item.pk:
+                await self.fetch_and_save_kids_items(kid_ids=kid_item.get('kids'), item_id=item_id, parent_comment_id=kid_news_item, depth=depth + 1)
+
+    def get_stored_comments(self, comment_ids):
+        """
+        Look up the comments of a batch that are already stored.
 
-         
-            
-            await self.save_model(kid_news_item)
-           
+        Args:
+            comment_ids (list): The Hacker News comment ids.
+
+        Returns:
+            dict: The stored HackerNewsComment instances keyed by Hacker News id.
+        """
+        return {
+            comment.item_id: comment
+            for comment in HackerNewsComment.objects.filter(item_id__in=comment_ids)
+        }
+
+    def save_comments(self, news_item, comments):
+        """
+        Create a batch of new comments and update the story's comment aggregates.
+
+        Args:
+            news_item (HackerNewsItem): The story the comments belong to.
+            comments (list): The unsaved HackerNewsComment instances.
+
+        """
+        with transaction.atomic():
+            HackerNewsComment.objects.bulk_create(comments)
+            add_comments_to_aggregates(news_item.item_id, comments)
+            record_changes(comment_changes([comment.item_id for comment in comments]))
+
+    def save_story(self, story, action, update_fields=None):
+        """
+        Save a story and record it in the change feed in one transaction.
+
+        A new story that another crawl stored meanwhile is left alone and keeps no pk.
+
+        Args:
+            story (HackerNewsItem): The story to save.
+            action (str): The ItemChange action to record, or None to record nothing.
+            update_fields (list, optional): The fields to update on an existing story.
+
+        """
+        try:
+            with transaction.atomic():
+                story.save(update_fields=update_fields)
+                if action:
+                    record_changes([story_change(story, action)])
+        except IntegrityError:
+            if update_fields is not None:
+                raise
+            story.pk = None
 
-            if 'kids' in kid_item:         
-                await self.fetch_and_save_kids_items(kid_ids=kid_item.get('kids'), item_id=kid_news_item.news_item, parent_comment_id=kid_news_item)
-    
     async def save_model(self, model):
         """
         Save the model instance asynchronously.
@@ -161,10 +300,19 @@ class HackerNewsFetcher:
         """
         Run the Hacker News fetching process asynchronously.
 
+        Every read of the crawl goes to the primary database: it decides what
+        to write from them, and a lagging replica would lead to duplicates.
+
         """
-        await self.initialize()
-        await self.fetch_news_items()
-        await self.close()
+        with use_primary():
+            await self.initialize()
+            try:
+                await self.fetch_news_items()
+                await sync_to_async(refresh_rank_scores)()
+                await sync_to_async(refresh_authors)(self.authors)
+                await sync_to_async(items_changed.send)(sender=self.__class__)
+            finally:
+                await self.close()
 
 
 if __name__ == '__main__':
@@ -1,26 +1,68 @@
 from asgiref.sync import sync_to_async
 from bleach import clean
-from django.core.paginator import Paginator
+from django.core.paginator import EmptyPage, Page, PageNotAnInteger, Paginator
 from django.db.models import Q
-from django.http import HttpResponse
-from django.shortcuts import render
-from django.views.generic import DetailView, ListView
+from django.http import Http404, HttpResponse
+from django.template.loader import get_template
+from django.views import View
 
+from .archive import load_archived_story
 from .models import HackerNewsComment, HackerNewsItem
+from .store import front_page
+
+
+async def apaginate(queryset, page_number, per_page):
+    """
+    Async equivalent of Paginator.get_page() using the async ORM.
+
+    Invalid page numbers fall back to the first page and out of range ones to
+    the last page, like get_page().
+
+    Args:
+        queryset (QuerySet): The queryset to paginate.
+        page_number (str): The requested page number.
+        per_page (int): The number of items per page.
+
+    Returns:
+        Page: The requested page, with its object_list not evaluated yet.
+    """
+    paginator = Paginator(queryset, per_page)
+    paginator.count = await queryset.acount()
+    try:
+        number = paginator.validate_number(page_number)
+    except PageNotAnInteger:
+        number = 1
+    except EmptyPage:
+        number = paginator.num_pages
+
+    bottom = (number - 1) * per_page
+    return Page(queryset[bottom:bottom + per_page], number, paginator)
 
 
-class HackernewsListView(ListView):
+def render_template(request, template_name, context):
+    """
+    Render a template directly on the event loop.
+
+    Only safe when the context holds evaluated data, so that rendering never
+    touches the database.
+
+    Returns:
+        HttpResponse: The rendered response.
+    """
+    return HttpResponse(get_template(template_name).render(context, request))
+
+
+class HackernewsListView(View):
     """
     A view for displaying a list of Hacker News items.
 
-    Inherits from Django's generic ListView class.
+    Runs fully async: the page is counted and fetched with the async ORM, or
+    read from the in-memory front page, and rendered on the event loop.
     """
-    model = HackerNewsItem
     template_name = 'news/hackernews_list.html'
-    context_object_name = 'news_items'
     paginate_by = 10
 
-    async def get_queryset(self):
+    def get_queryset(self):
         """
         Retrieve the queryset of Hacker News items.
 
@@ -29,10 +71,11 @@ class HackernewsListView(ListView):
         Returns:
             queryset (QuerySet): The filtered and sorted queryset of Hacker News items.
         """
-        queryset = await sync_to_async(HackerNewsItem.objects.all)()
+        queryset = HackerNewsItem.objects.all()
 
-        item_type = self.request.GET.get('item_type')
+        item_type = self.request.GET.get('item_type') or self.kwargs.get('item_type')
         search_query = self.request.GET.get('search')
+        sort = self.request.GET.get('sort')
 
         if item_type:
             queryset = queryset.filter(item_type=item_type)
@@ -40,103 +83,243 @@ class HackernewsListView(ListView):
         if search_query:
             queryset = queryset.filter(title__icontains=search_query)
         
+        if sort == 'hot':
+            # rank_score is indexed and precomputed after every sync
+            return queryset.order_by('-rank_score', '-id')
 
         return queryset.order_by('-id')
 
     async def get(self, request, *args, **kwargs):
         """
-        A view for displaying the details of a Hacker News item.
+        Render one page of the Hacker News items.
 
-        Inherits from Django's generic DetailView class.
         """
-        queryset = await self.get_queryset()
-
-        paginator = Paginator(queryset, self.paginate_by)
-        page_number = request.GET.get('page')
-        page_obj= await sync_to_async(paginator.get_page)(page_number)
+        queryset = self.get_queryset()
+        page_obj = await apaginate(queryset, request.GET.get('page'), self.paginate_by)
+
+        stored_items = None
+        if not request.GET.get('item_type') and not kwargs.get('item_type') and not request.GET.get('search'):
+            # The first pages of the unfiltered list come from the in-memory front page
+            if request.GET.get('sort') == 'hot':
+                stored_items = await front_page.ahottest(page_obj.end_index())
+            else:
+                stored_items = await front_page.anewest(page_obj.end_index())
+
+        if stored_items is not None:
+            page_obj.object_list = stored_items[page_obj.start_index() - 1:]
+        else:
+            page_obj.object_list = [news_item async for news_item in page_obj.object_list]
 
         context = {'news_items': page_obj}
 
         context['item_type'] = request.GET.get('item_type', 'All')
-        return await sync_to_async(render)(request, self.template_name, context)
+        context['sort'] = request.GET.get('sort', '')
+        return render_template(request, self.template_name, context)
 
-class HackernewsDetails(DetailView):
+class HackernewsDetails(View):
     """
     A view for displaying the details of a Hacker News item.
 
-    Inherits from Django's generic DetailView class.
+    Loads the story and its whole comment tree with two async queries and
+    renders on the event loop.
     """
 
-    model = HackerNewsItem
     template_name = 'news/hackernews_detail.html'
-    context_object_name = 'news_item'
 
-    def get_object(self, queryset=None):
+    async def get(self, request, pk):
         """
-        Retrieve the Hacker News item object.
+        Render a Hacker News item with its comments.
 
-        Returns:
-            HackerNewsItem: The Hacker News item object.
-        """
-        news_id = self.kwargs.get('pk')
-        news_item = HackerNewsItem.objects.get(id=news_id)
-        return news_item
-
-    def get_context_data(self, **kwargs):
-        """
-        Get the context data for rendering the template.
-
-        Retrieves the comments associated with the Hacker News item and cleans them.
+        Stories past the retention period are served from the archive.
 
-        Returns:
-            dict: The context data for rendering the template.
         """
-
-        context = super().get_context_data(**kwargs)
-        comments = HackerNewsComment.objects.filter(news_item=context['news_item'], parent=None)
-        context['comments'] = self.clean_comments(comments)
-        return context
+        try:
+            news_item = await HackerNewsItem.objects.aget(id=pk)
+        except HackerNewsItem.DoesNotExist:
+            archived = await sync_to_async(load_archived_story)(story_pk=pk)
+            if archived is None:
+                raise Http404('No HackerNewsItem matches the given query.')
+            news_item, comments = archived
+        else:
+            comments = [
+                comment async for comment in
+                HackerNewsComment.objects.filter(news_item=news_item).order_by('id')
+            ]
+
+        context = {
+            'news_item': news_item,
+            'comments': self.clean_comments(comments),
+        }
+        return render_template(request, self.template_name, context)
 
     def clean_comments(self, comments):
         """
-        Clean and structure the comments recursively.
+        Structure the comments hierarchically.
 
-        Cleans the HTML content of the comments and structures them in a hierarchical format.
+        Builds the tree in memory from the flat list of a story's comments
+        instead of querying the children of every comment.
 
         Args:
-            comments (QuerySet): The comments to be cleaned.
+            comments (list): All the comments of the story.
 
         Returns:
-            list: The cleaned and structured comments.
+            list: The structured comments.
         """
-        cleaned_comments = []
+        children = {}
         for comment in comments:
-            cleaned_comment = {
-                'comment': comment,
-                'children': self.clean_comments(HackerNewsComment.objects.filter(parent=comment))
-            }
-            cleaned_comments.append(cleaned_comment)
-        return cleaned_comments
+            children.setdefault(comment.parent_id, []).append(comment)
+
+        def build(parent_id):
+            return [{'comment': comment, 'children': build(comment.id)} for comment in children.get(parent_id, [])]
+
+        return build(None)
 
 
 
 
 """
 
-helper view to manually fetch the news
+helper views to manually fetch the news
 
 """
     
 import asyncio
 
-from django.http import HttpResponse
-from django.views import View
+import ujson
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import JsonResponse, StreamingHttpResponse
+from django.urls import reverse
+
+from .changes import changes_since
+from .jobs import crawl_jobs
+
+
+def sse_event(event, data):
+    """
+    Format one server-sent event.
+
+    Args:
+        event (str): The event name.
+        data: The JSON-serializable payload.
 
-from .utils import HackerNewsFetcher
+    Returns:
+        str: The event, ready to be written to a text/event-stream response.
+    """
+    return f'event: {event}\ndata: {ujson.dumps(data, default=DjangoJSONEncoder().default)}\n\n'
+
+
+def event_stream_response(stream):
+    """
+    Wrap an async generator of events in an unbuffered streaming response.
+
+    Args:
+        stream: The async generator yielding formatted events.
+
+    Returns:
+        StreamingHttpResponse: The text/event-stream response.
+    """
+    response = StreamingHttpResponse(stream, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
 
 
 class FetchHackerNewsView(View):
+    """
+    Enqueue a background crawl and return its job id straight away.
+
+    If a crawl is already running, its job is returned instead of starting another one.
+    """
+    async def get(self, request):
+        job, created = crawl_jobs.enqueue()
+        payload = job.as_dict()
+        payload['status_url'] = reverse('fetch_hacker_news_status', args=[job.id])
+        payload['events_url'] = reverse('fetch_hacker_news_events', args=[job.id])
+        return JsonResponse(payload, status=202 if created else 200)
+
+
+class FetchHackerNewsStatusView(View):
+    """
+    Report the status and progress of a crawl job.
+    """
+    async def get(self, request, job_id):
+        job = crawl_jobs.get(job_id)
+        if job is None:
+            raise Http404('Unknown crawl job')
+        return JsonResponse(job.as_dict())
+
+
+class FetchHackerNewsEventsView(View):
+    """
+    Stream the progress of a crawl job as server-sent events until it finishes.
+    """
+    interval = 1
+
+    async def get(self, request, job_id):
+        job = crawl_jobs.get(job_id)
+        if job is None:
+            raise Http404('Unknown crawl job')
+
+        return event_stream_response(self.stream(job))
+
+    async def stream(self, job):
+        """
+        Yield a progress event every interval, and a final event once the job is done.
+
+        Args:
+            job (CrawlJob): The job to report on.
+        """
+        last_state = None
+        while True:
+            state = job.as_dict()
+            if state != last_state:
+                yield sse_event('progress', state)
+                last_state = state
+            if not job.is_active:
+                yield sse_event('done', state)
+                return
+            await asyncio.sleep(self.interval)
+
+
+class ChangeFeedEventsView(View):
+    """
+    Stream the change feed as server-sent events.
+
+    Starts after the since query parameter, or after the browser's
+    Last-Event-ID when it reconnects, and sends a comment every
+    keepalive_interval seconds so idle proxies keep the connection open.
+    """
+    interval = 1
+    keepalive_interval = 15
+    batch_size = 100
+
     async def get(self, request):
-        hacker_news_fetcher = HackerNewsFetcher()
-        await hacker_news_fetcher.run()
-        return HttpResponse("Hacker News fetch completed.")
+        since = request.headers.get('Last-Event-ID') or request.GET.get('since') or 0
+        try:
+            since = int(since)
+        except ValueError:
+            since = 0
+        return event_stream_response(self.stream(since))
+
+    async def stream(self, cursor):
+        """
+        Yield a change event per entry of the change feed after the cursor.
+
+        Args:
+            cursor (int): The id of the last change the client has seen.
+        """
+        idle = 0
+        while True:
+            changes = [change async for change in changes_since(cursor, self.batch_size)]
+            for change in changes:
+                cursor = change['id']
+                yield f'id: {cursor}\n' + sse_event('change', change)
+            if changes:
+                idle = 0
+                continue
+
+            idle += self.interval
+            if idle >= self.keepalive_interval:
+                yield ': keepalive\n\n'
+                idle = 0
+            await asyncio.sleep(self.interval)
@@ -0,0 +1,70 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+
+_use_primary = ContextVar('use_primary', default=False)
+
+
+@contextmanager
+def use_primary():
+    """
+    Route every read made in the block, or in the decorated function, to 'default'.
+
+    For code that reads rows it is about to write, e.g. the crawler, which
+    must not act on a lagging replica. The flag is a ContextVar, so it follows
+    the code into tasks and sync_to_async threads started inside the block.
+    """
+    token = _use_primary.set(True)
+    try:
+        yield
+    finally:
+        _use_primary.reset(token)
+
+
+def configure_sqlite(sender, connection, **kwargs):
+    """
+    Apply the SQLITE_PRAGMAS setting to every new SQLite connection.
+
+    Connected to django.db.backends.signals.connection_created.
+
+    Args:
+        sender: The database wrapper class.
+        connection: The new database connection wrapper.
+    """
+    pragmas = settings.SQLITE_PRAGMAS
+    if connection.vendor != 'sqlite' or not pragmas:
+        return
+
+    with connection.cursor() as cursor:
+        for pragma, value in pragmas.items():
+            cursor.execute(f'PRAGMA {pragma}={value};')
+
+
+class ReadReplicaRouter:
+    """
+    Send reads to the 'replica' database alias and writes to 'default'.
+
+    Lets the crawler write through the primary while page reads are served by
+    a replica, so long write transactions never block the list views. Reads
+    inside a transaction on 'default' or under use_primary() stay on 'default'.
+    """
+
+    replica = 'replica'
+
+    def db_for_read(self, model, **hints):
+        if self.replica not in settings.DATABASES:
+            return None
+        if _use_primary.get() or connections['default'].in_atomic_block:
+            return 'default'
+        return self.replica
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == 'default'
@@ -0,0 +1,163 @@
+import logging
+import random
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.template.base import Template
+
+logger = logging.getLogger('hackernews.profiling')
+
+_current_profile = ContextVar('request_profile', default=None)
+
+
+class RequestProfile:
+    """
+    Per-request counters filled in by the query and template hooks.
+
+    """
+    __slots__ = ('queries', 'db_time', 'template_time', '_template_depth')
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self._template_depth = 0
+
+
+def profile_queries(execute, sql, params, many, context):
+    """
+    Database execute wrapper that counts and times queries for the current request.
+
+    """
+    profile = _current_profile.get()
+    if profile is None:
+        return execute(sql, params, many, context)
+
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        profile.queries += 1
+        profile.db_time += time.perf_counter() - start
+
+
+def install_query_profiler(sender=None, connection=None, **kwargs):
+    """
+    Add profile_queries to a connection's execute wrappers once.
+
+    Connected to connection_created so connections opened by sync_to_async
+    threads are covered too; the ContextVar routes their queries to the request.
+    """
+    if profile_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.append(profile_queries)
+
+
+def _profiled_render(render):
+    def wrapper(self, context):
+        profile = _current_profile.get()
+        if profile is None:
+            return render(self, context)
+
+        # Included templates render inside their parent, only time the outermost one
+        profile._template_depth += 1
+        start = time.perf_counter()
+        try:
+            return render(self, context)
+        finally:
+            profile._template_depth -= 1
+            if profile._template_depth == 0:
+                profile.template_time += time.perf_counter() - start
+
+    wrapper.profiled = True
+    return wrapper
+
+
+def install_template_profiler():
+    if not getattr(Template.render, 'profiled', False):
+        Template.render = _profiled_render(Template.render)
+
+
+class RequestProfilingMiddleware:
+    """
+    Opt-in middleware that measures each request and reports it in Server-Timing.
+
+    Records the number of SQL queries, total DB time, template render time and
+    response size for views and the Ninja API alike, and logs a sample of the
+    requests slower than slow_request_ms. Enabled with REQUEST_PROFILING['enabled'].
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.options = settings.REQUEST_PROFILING
+        if not self.options['enabled']:
+            raise MiddlewareNotUsed
+
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+        connection_created.connect(install_query_profiler)
+        for connection in connections.all(initialized_only=True):
+            install_query_profiler(connection=connection)
+        install_template_profiler()
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+
+        profile = RequestProfile()
+        token = _current_profile.set(profile)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current_profile.reset(token)
+        return self.process_profile(request, response, profile, time.perf_counter() - start)
+
+    async def __acall__(self, request):
+        profile = RequestProfile()
+        token = _current_profile.set(profile)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current_profile.reset(token)
+        return self.process_profile(request, response, profile, time.perf_counter() - start)
+
+    def process_profile(self, request, response, profile, total_time):
+        """
+        Attach the Server-Timing header and log the request if it was slow.
+
+        Args:
+            request (HttpRequest): The HTTP request object.
+            response (HttpResponse): The response returned by the view.
+            profile (RequestProfile): The counters collected for the request.
+            total_time (float): The time spent in the view, in seconds.
+
+        Returns:
+            HttpResponse: The response with the Server-Timing header.
+        """
+        size = None if response.streaming else len(response.content)
+        timings = [
+            f'db;dur={profile.db_time * 1000:.1f};desc="{profile.queries} queries"',
+            f'tpl;dur={profile.template_time * 1000:.1f}',
+            f'total;dur={total_time * 1000:.1f}',
+        ]
+        if size is not None:
+            timings.append(f'size;desc="{size} bytes"')
+        response['Server-Timing'] = ', '.join(timings)
+
+        if total_time * 1000 >= self.options['slow_request_ms'] and random.random() < self.options['sample_rate']:
+            logger.warning(
+                'Slow request %s %s: %.1fms total, %d queries in %.1fms, templates %.1fms, %s bytes',
+                request.method, request.get_full_path(), total_time * 1000,
+                profile.queries, profile.db_time * 1000, profile.template_time * 1000, size,
+            )
+        return response
@@ -14,13 +14,22 @@ class Command(BaseCommand):
         """
         Handle the execution of the command.
 
-        Schedules the synchronization of Hacker News items using Django-Q's schedule function.
+        Schedules the synchronization of Hacker News items using Django-Q's schedule function,
+        the adaptive refresh of the items already stored and the daily archiving of old stories.
 
         """
         schedule('hackernews.scheduler.tasks.schedule_sync_news', name='hackernewsScheduler', hook='hackernews.scheduler.hooks.print_result', schedule_type='I', minutes=5, repeats=-1)
 
         print(f'hackernewsScheduler created and will run every 5 mintues')
 
+        schedule('hackernews.scheduler.tasks.refresh_news_items', name='hackernewsRefresher', hook='hackernews.scheduler.hooks.print_result', schedule_type='I', minutes=1, repeats=-1)
+
+        print(f'hackernewsRefresher created and will refresh due items every minute')
+
+        schedule('hackernews.scheduler.tasks.archive_old_stories', name='hackernewsArchiver', hook='hackernews.scheduler.hooks.print_result', schedule_type='D', repeats=-1)
+
+        print(f'hackernewsArchiver created and will archive old stories daily')
+
 
 
 
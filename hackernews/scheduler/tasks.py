@@ -1,19 +1,51 @@
 import asyncio
+import uuid
+from datetime import timedelta
 
+from django.conf import settings
+from django.utils import timezone
 from django_q.tasks import async_task
 
+from hackernews.apps.news.archive import archive_stories
+from hackernews.apps.news.changes import prune_changes
+from hackernews.apps.news.inflight import coalescing_ratio, inflight
+from hackernews.apps.news.jobs import crawl_lock
+from hackernews.apps.news.refresh import RefreshScheduler
 from hackernews.apps.news.utils import HackerNewsFetcher
 
+_worker_loop = None
+
+
+def get_worker_loop():
+    """
+    Return the event loop kept alive for the lifetime of the worker process.
+
+    asyncio.run() would create and close a fresh loop on every scheduled run,
+    throwing away the shared HTTP session and its pooled connections.
+
+    Returns:
+        asyncio.AbstractEventLoop: The persistent loop for this process.
+    """
+    global _worker_loop
+    if _worker_loop is None or _worker_loop.is_closed():
+        _worker_loop = asyncio.new_event_loop()
+    return _worker_loop
+
 
 async def news_scrapper():
     """
     Asynchronous function for running the Hacker News scrapper.
 
-    Instantiates a HackerNewsFetcher object and runs the scrapper.
+    Instantiates a HackerNewsFetcher object and runs the scrapper, unless
+    a manual crawl already holds the crawl lock.
 
     """
-    propagate = HackerNewsFetcher()
-    await propagate.run()
+    async with crawl_lock(uuid.uuid4().hex) as acquired:
+        if not acquired:
+            print('Another crawl is already running, skipped')
+            return
+        propagate = HackerNewsFetcher()
+        await propagate.run()
 
 
 
@@ -26,10 +58,62 @@ def schedule_sync_news():
     Returns:
         async_task: The created async task.
     """
-    scrapper  = asyncio.run(news_scrapper())
+    scrapper  = get_worker_loop().run_until_complete(news_scrapper())
 
     item=async_task(scrapper)
 
     print('Task created')
     return(item)
 
+
+
+async def refresh_cycle():
+    """
+    Run one refresh cycle, unless a crawl holds the crawl lock.
+
+    Returns:
+        int: The number of items refreshed, or None when skipped.
+    """
+    async with crawl_lock(uuid.uuid4().hex) as acquired:
+        if not acquired:
+            return None
+        refresher = RefreshScheduler(fetcher=HackerNewsFetcher())
+        return await refresher.run_cycle()
+
+
+def refresh_news_items():
+    """
+    Refresh the stored stories that are due, within the per-cycle budget.
+
+    Runs on the persistent worker loop so it shares the pooled HTTP session
+    with the full crawls, and takes the crawl lock so it never writes the
+    same stories as a running crawl.
+
+    Returns:
+        int: The number of items refreshed.
+    """
+    refreshed = get_worker_loop().run_until_complete(refresh_cycle())
+    if refreshed is None:
+        print('A crawl is running, refresh skipped')
+        return 0
+
+    print(f'{refreshed} items refreshed, coalescing ratio {coalescing_ratio(inflight.stats):.1%} since the worker started')
+    return refreshed
+
+
+def archive_old_stories():
+    """
+    Archive the stories older than the retention period and prune the change feed.
+
+    Returns:
+        int: The number of stories archived.
+    """
+    archived = archive_stories()
+    if archived is None:
+        print('Another archive run is in progress, skipped')
+        return 0
+    retention = timedelta(days=settings.HACKERNEWS_ARCHIVE['changes_retention_days'])
+    pruned = prune_changes(timezone.now() - retention)
+
+    print(f'{archived} stories archived, {pruned} changes pruned')
+    return archived
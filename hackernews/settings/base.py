@@ -51,6 +51,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'hackernews.middleware.RequestProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -91,6 +92,9 @@ DATABASES = {
     }
 }
 
+# PRAGMAs applied to every new SQLite connection, see hackernews/db.py
+SQLITE_PRAGMAS = {}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -132,3 +136,66 @@ STATIC_URL = 'static/'
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+# Shared aiohttp session used by the Hacker News fetcher
+# See hackernews/apps/news/client.py
+
+HACKERNEWS_HTTP = {
+    'pool_size': 100,
+    'pool_size_per_host': 0,
+    'dns_cache_ttl': 300,
+    'keepalive_timeout': 60,
+    'timeout': 30,
+    # Missing, deleted and dead items are not requested again for this long
+    'negative_cache_ttl': 300,
+    'negative_cache_size': 10000,
+}
+
+# Hot ranking of stories, see hackernews/apps/news/ranking.py
+
+HACKERNEWS_RANKING = {
+    'gravity': 1.8,
+    'comment_weight': 0.0,
+    'age_offset_hours': 2,
+    'max_age_hours': 72,
+    'batch_size': 500,
+}
+
+# Adaptive refresh of stored stories, see hackernews/apps/news/refresh.py
+
+HACKERNEWS_REFRESH = {
+    'budget': 100,
+    'min_interval_seconds': 60,
+    'max_age_hours': 72,
+}
+
+# Number of newest and hottest items kept in the in-memory front page,
+# see hackernews/apps/news/store.py
+
+HACKERNEWS_FRONT_PAGE_SIZE = 500
+
+# Per-request query count, DB time and template time reported in Server-Timing,
+# see hackernews/middleware.py
+
+REQUEST_PROFILING = {
+    'enabled': env.bool('REQUEST_PROFILING', default=False),
+    'sample_rate': 0.1,
+    'slow_request_ms': 500,
+}
+
+# Retention of old stories, see hackernews/apps/news/archive.py
+
+HACKERNEWS_ARCHIVE = {
+    'root': env.str('HACKERNEWS_ARCHIVE_ROOT', default=str(BASE_DIR / '../archive')),
+    'retention_days': env.int('HACKERNEWS_RETENTION_DAYS', default=30),
+    'batch_size': 200,
+    # How long the change feed keeps its entries for consumers to catch up
+    'changes_retention_days': env.int('HACKERNEWS_CHANGES_RETENTION_DAYS', default=7),
+}
+
+# Where HackerNewsFetcher reads items from, see hackernews/apps/news/sources.py
+
+HACKERNEWS_ITEM_SOURCE = {
+    'BACKEND': 'hackernews.apps.news.sources.HttpItemSource',
+    'OPTIONS': {},
+}
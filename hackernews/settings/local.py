@@ -39,4 +39,12 @@ Q_CLUSTER = {
         'errors': 'strict',
         'unix_socket_path': None
     }
-}
\ No newline at end of file
+}
+
+# Shared by the web server and the Django-Q workers, e.g. for the front page version
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': env.str('REDIS_CACHE_URL', default='redis://localhost:6379/1'),
+    }
+}
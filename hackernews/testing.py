@@ -0,0 +1,44 @@
+from contextlib import contextmanager
+
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test.utils import CaptureQueriesContext
+
+
+@contextmanager
+def assert_max_queries(max_queries, using=DEFAULT_DB_ALIAS):
+    """
+    Fail when the wrapped block runs more than max_queries SQL queries.
+
+    Args:
+        max_queries (int): The query budget.
+        using (str, optional): The database alias to watch. Defaults to 'default'.
+
+    Yields:
+        CaptureQueriesContext: The captured queries.
+    """
+    with CaptureQueriesContext(connections[using]) as captured:
+        yield captured
+
+    if len(captured) > max_queries:
+        queries = '\n'.join(f'{i}. {query["sql"]}' for i, query in enumerate(captured.captured_queries, start=1))
+        raise AssertionError(
+            f'{len(captured)} queries executed, budget is {max_queries}\n{queries}'
+        )
+
+
+def assert_query_budget(client, url, max_queries, method='get', **kwargs):
+    """
+    Request an endpoint with the test client and assert it stays within a query budget.
+
+    Args:
+        client (Client): The Django test client.
+        url (str): The endpoint to request.
+        max_queries (int): The query budget.
+        method (str, optional): The client method to call. Defaults to 'get'.
+
+    Returns:
+        HttpResponse: The response, for further assertions.
+    """
+    with assert_max_queries(max_queries):
+        response = getattr(client, method)(url, **kwargs)
+    return response